@@ -0,0 +1,112 @@
+"""
+Asyncio-native serving entry point with the same API as main.py.
+Each in-flight question is a coroutine awaiting the model, so one event
+loop can hold hundreds of concurrent requests open.
+
+    uvicorn asgi_main:app --host 0.0.0.0 --port 5000
+"""
+import json
+import asyncio
+from urllib.parse import parse_qsl
+from main import resource_manager, coordinator  # Shared startup: env check, resources, agents
+from multi_agent_system.metrics import METRICS
+from multi_agent_system.scheduler import PRIORITIES, RateLimitedError
+from multi_agent_system.structured_logging import new_request_id
+
+
+async def send_body(send, status: int, payload: bytes, content_type: bytes, headers: dict = None):
+    extra = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(payload)).encode())] + extra,
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def send_json(send, status: int, body: dict, headers: dict = None):
+    await send_body(send, status, json.dumps(body).encode("utf-8"), b"application/json", headers)
+
+
+async def reload_resource(params: dict, client, headers: dict):
+    if params.get("background", "").lower() in ("1", "true", "yes"):
+        resource_manager.reload_in_background()
+        return 202, {"detail": "Resource reload started."}
+    try:
+        await asyncio.to_thread(resource_manager.load_resources)
+        return 200, {"detail": "Resources reloaded successfully."}
+    except Exception as e:
+        return 500, {"detail": f"Failed to reload resources: {str(e)}"}
+
+
+async def ask_question(params: dict, client, headers: dict):
+    query = params.get("query")
+    if not query:
+        return 400, {"detail": "Query not provided"}
+    # Each headset sends its own session id; fall back to the client address.
+    session_id = params.get("session_id") or (client[0] if client else None)
+    priority = params.get("priority", "interactive")
+    if priority not in PRIORITIES:
+        return 400, {"detail": f"Unknown priority; expected one of {', '.join(PRIORITIES)}"}
+    try:
+        timeout = float(params["timeout"]) if params.get("timeout") else None
+    except ValueError:
+        return 400, {"detail": "timeout must be a number of seconds"}
+    # Propagate the caller's request id into the logs, or start a new one.
+    request_id = headers.get("x-request-id") or new_request_id()
+    try:
+        answer, timings = await coordinator.route_query_async(query, session_id=session_id, request_id=request_id,
+                                                              priority=priority, timeout=timeout)
+        return 200, {"query": query, "answer": answer, "timings": timings}, {"X-Request-ID": request_id}
+    except RateLimitedError as e:
+        return 503, {"detail": str(e)}, {"Retry-After": "5"}
+    except Exception as e:
+        return 500, {"detail": str(e)}
+
+
+async def metrics(params: dict, client, headers: dict):
+    return 200, METRICS.render()
+
+
+ROUTES = {
+    "/reload_resource": reload_resource,
+    "/ask": ask_question,
+    "/metrics": metrics,
+}
+
+
+async def app(scope, receive, send):
+    """
+    Minimal ASGI application serving GET /ask, /reload_resource and /metrics.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get(scope["path"])
+    if handler is None:
+        await send_json(send, 404, {"detail": "Not Found"})
+    elif scope["method"] != "GET":
+        await send_json(send, 405, {"detail": "Method Not Allowed"})
+    else:
+        params = dict(parse_qsl(scope["query_string"].decode("utf-8")))
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        # Handlers return (status, body) or (status, body, response headers).
+        status, body, *response_headers = await handler(params, scope.get("client"), headers)
+        response_headers = response_headers[0] if response_headers else None
+        if isinstance(body, str):  # Plain-text bodies, e.g. /metrics
+            await send_body(send, status, body.encode("utf-8"), b"text/plain; version=0.0.4", response_headers)
+        else:
+            await send_json(send, status, body, response_headers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
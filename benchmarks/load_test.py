@@ -0,0 +1,332 @@
+"""
+End-to-end load test: replays a question corpus against the service and
+reports latency percentiles, throughput and error rate, overall, per agent
+and per stage (from the returned `timings`). Run from the repository root:
+
+    # In-process coordinator with the offline model stand-in
+    python -m benchmarks.load_test --backend local --concurrency 16 --requests 500
+
+    # A running server (main.py or asgi_main.py), 20 requests/s arrival rate
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --rate 20 --duration 60
+
+    # Save results and compare against an earlier run
+    python -m benchmarks.load_test --output after.json --baseline before.json
+
+The corpus defaults to every question in test.py (commented ones included);
+--corpus adds text files (one question per line) or exported JSON-lines
+logs with a "query" field.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_SCRIPT = os.path.join(ROOT, "test.py")
+PERCENTILES = (50, 95, 99)
+SUB_QUESTION_PREFIX = re.compile(r"^q\d+_")
+
+
+def load_corpus(paths=()) -> list:
+    """
+    Returns the questions of test.py followed by those in `paths`.
+    """
+    with open(TEST_SCRIPT, "r", encoding="utf-8") as file:
+        questions = re.findall(r'^\s*#?\s*"(.+?)",?\s*(?:#.*)?$', file.read(), re.MULTILINE)
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    line = json.loads(line).get("query", "")
+                if line:
+                    questions.append(line)
+    return questions
+
+
+class InProcessTarget:
+    """
+    Calls AgentCoordinator.route_query directly (no HTTP), so only our own
+    code paths and the selected LLM backend are measured.
+    """
+    def __init__(self, backend: str = "local", resource_dir: str = os.path.join(ROOT, "uSucceed_resource")):
+        from multi_agent_system.llm_backend import create_backend
+        from multi_agent_system.resource_manager import ResourceManager
+        from multi_agent_system.agent_coordinator import AgentCoordinator
+
+        llm = create_backend(backend)
+        self.resource_manager = ResourceManager(resource_dir=resource_dir, backend=llm)
+        self.resource_manager.load_resources()
+        self.coordinator = AgentCoordinator(self.resource_manager, backend=llm)
+        self.name = f"in-process ({llm.name})"
+
+    def label(self, query: str) -> str:
+        return self.coordinator.detect_query_type(query)
+
+    def ask(self, query: str, session_id: str) -> dict:
+        return self.coordinator.route_query(query, session_id=session_id)[1]
+
+
+class HttpTarget:
+    """
+    Sends GET /ask to a running server. Queries are labelled with an agent
+    the way the coordinator does it, using the local intent classifier.
+    """
+    def __init__(self, url: str, timeout: float = 120.0, min_intent_confidence: float = 0.6):
+        import requests
+        from multi_agent_system.intent_classifier import IntentClassifier
+        from multi_agent_system.router import KEYWORD_ROUTER
+
+        self.url = url.rstrip("/") + "/ask"
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.classifier = IntentClassifier.load_or_train()
+        self.router = KEYWORD_ROUTER
+        self.min_intent_confidence = min_intent_confidence
+        self.name = url
+
+    def label(self, query: str) -> str:
+        query_type, confidence = self.classifier.predict(query)
+        return query_type if confidence >= self.min_intent_confidence else self.router.detect(query)
+
+    def ask(self, query: str, session_id: str) -> dict:
+        response = self.http.get(self.url, params={"query": query, "session_id": session_id}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json().get("timings", {})
+
+
+def summarize(values) -> dict:
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values, dtype=float)
+    summary = {"count": int(values.size), "mean": float(values.mean()), "max": float(values.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+
+class LoadTest:
+    """
+    Replays `questions` (in a seeded random order) against a target.
+    With `rate` = 0 the test is closed-loop: `concurrency` workers each send
+    the next question as soon as their previous one is answered. Otherwise
+    requests arrive as a Poisson process of `rate` per second and latency
+    is measured from the scheduled arrival, so queueing delay counts too.
+    """
+    def __init__(self, target, questions, concurrency: int = 8, rate: float = 0.0, requests: int = 200,
+                 duration: float = None, sessions: int = 32, warmup: int = 0, seed: int = 0):
+        self.target = target
+        self.questions = questions
+        self.concurrency = concurrency
+        self.rate = rate
+        self.requests = requests
+        self.duration = duration
+        self.sessions = sessions
+        self.warmup = warmup
+        self.random = random.Random(seed)
+        self.results = []  # (agent, latency, timings or None, error or None)
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def _next_question(self, number: int):
+        question = self.questions[self.random.randrange(len(self.questions))]
+        return question, f"load-test-{number % self.sessions}"
+
+    def _send(self, question: str, session_id: str, scheduled: float, record: bool = True):
+        agent = self._labels.get(question)
+        if agent is None:
+            agent = self._labels.setdefault(question, self.target.label(question))
+        timings, error = None, None
+        try:
+            timings = self.target.ask(question, session_id)
+        except Exception as e:
+            error = str(e)
+        latency = time.perf_counter() - scheduled
+        if record:
+            with self._lock:
+                self.results.append((agent, latency, timings, error))
+
+    def _done(self, number: int, start: float) -> bool:
+        if self.duration is not None:
+            return time.perf_counter() - start >= self.duration
+        return number >= self.requests
+
+    def run(self) -> dict:
+        for number in range(self.warmup):
+            question, session_id = self._next_question(number)
+            self._send(question, session_id, time.perf_counter(), record=False)
+
+        start = time.perf_counter()
+        if self.rate:
+            self._run_open_loop(start)
+        else:
+            self._run_closed_loop(start)
+        return self.report(time.perf_counter() - start)
+
+    def _run_closed_loop(self, start: float):
+        counter = iter(range(sys.maxsize))
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    number = next(counter)
+                    if self._done(number, start):
+                        return
+                    question, session_id = self._next_question(number)
+                self._send(question, session_id, time.perf_counter())
+
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _run_open_loop(self, start: float):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            scheduled = start
+            number = 0
+            while not self._done(number, start):
+                scheduled += self.random.expovariate(self.rate)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                question, session_id = self._next_question(number)
+                pool.submit(self._send, question, session_id, scheduled)
+                number += 1
+
+    def report(self, elapsed: float) -> dict:
+        latencies, by_agent, stages, errors = [], defaultdict(list), defaultdict(list), Counter()
+        cache_hits = Counter()
+        for agent, latency, timings, error in self.results:
+            if error is not None:
+                errors[error] += 1
+                continue
+            latencies.append(latency)
+            by_agent[agent].append(latency)
+            for key, value in timings.items():
+                stage = SUB_QUESTION_PREFIX.sub("", key)
+                if stage.endswith("_time") or stage.startswith("time_to_"):
+                    stages[stage].append(value)
+                elif stage in ("cache_hit", "semantic_cache_hit"):
+                    cache_hits[stage] += value
+
+        total = len(self.results)
+        agent_errors = Counter(agent for agent, _, _, error in self.results if error is not None)
+        return {
+            "config": {
+                "target": self.target.name, "concurrency": self.concurrency, "rate": self.rate,
+                "requests": self.requests, "duration": self.duration, "sessions": self.sessions,
+                "questions": len(self.questions), "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "requests": total,
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "error_rate": sum(errors.values()) / total if total else 0.0,
+            "latency": summarize(latencies),
+            "agents": {agent: dict(summarize(values), errors=agent_errors[agent])
+                       for agent, values in sorted(by_agent.items())},
+            "stages": {stage: summarize(values) for stage, values in sorted(stages.items())},
+            "cache_hit_rate": {key: count / len(latencies) for key, count in cache_hits.items()} if latencies else {},
+            "errors": dict(errors.most_common(10)),
+        }
+
+
+def print_report(report: dict):
+    def row(name, summary):
+        if not summary.get("count"):
+            return f"  {name:<24} {'-':>8}"
+        return (f"  {name:<24} {summary['count']:>6} " +
+                " ".join(f"{summary[f'p{p}'] * 1000:>9.1f}" for p in PERCENTILES) +
+                f" {summary['mean'] * 1000:>9.1f}")
+
+    header = f"  {'':<24} {'count':>6} " + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES) + f" {'mean ms':>9}"
+    print(f"Target: {report['config']['target']}")
+    print(f"{report['requests']} requests in {report['elapsed']:.1f}s: "
+          f"{report['throughput']:.1f} req/s, error rate {report['error_rate']:.1%}")
+    print(header)
+    print(row("all", report["latency"]))
+    print("Per agent:")
+    for agent, summary in report["agents"].items():
+        print(row(agent, summary))
+    print("Per stage:")
+    for stage, summary in report["stages"].items():
+        print(row(stage, summary))
+    for key, rate in report["cache_hit_rate"].items():
+        print(f"  {key}: {rate:.1%}")
+    for error, count in report["errors"].items():
+        print(f"  error x{count}: {error}")
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> bool:
+    """
+    Prints the change of each headline number against a baseline run and
+    returns False if any latency percentile grew by more than `max_regression`.
+    """
+    ok = True
+    print(f"Compared with baseline from {baseline['config'].get('started_at')}:")
+    for p in PERCENTILES:
+        key = f"p{p}"
+        before, after = baseline["latency"].get(key), report["latency"].get(key)
+        if not before or after is None:
+            continue
+        change = after / before - 1
+        regressed = change > max_regression
+        ok = ok and not regressed
+        print(f"  latency {key}: {before * 1000:.1f} -> {after * 1000:.1f} ms ({change:+.1%})"
+              f"{'  REGRESSION' if regressed else ''}")
+    print(f"  throughput: {baseline['throughput']:.1f} -> {report['throughput']:.1f} req/s")
+    print(f"  error rate: {baseline['error_rate']:.1%} -> {report['error_rate']:.1%}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay questions against the service and report latency.")
+    parser.add_argument("--url", help="Base URL of a running server; in-process coordinator if omitted")
+    parser.add_argument("--backend", default="local", help="LLM backend for the in-process target (local or gemini)")
+    parser.add_argument("--corpus", nargs="*", default=(), help="Extra question files (text or JSON lines)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivals per second (0 = closed loop)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument("--sessions", type=int, default=32, help="Number of distinct session ids")
+    parser.add_argument("--warmup", type=int, default=0, help="Unrecorded requests sent first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the service's logs while running")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Allowed relative latency increase over the baseline")
+    args = parser.parse_args(argv)
+
+    from multi_agent_system.structured_logging import configure_logging
+    configure_logging(level=None if args.verbose else "CRITICAL")
+    target = HttpTarget(args.url) if args.url else InProcessTarget(args.backend)
+    test = LoadTest(target, load_corpus(args.corpus), concurrency=args.concurrency, rate=args.rate,
+                    requests=args.requests, duration=args.duration, sessions=args.sessions,
+                    warmup=args.warmup, seed=args.seed)
+    report = test.run()
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved report to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            if not compare(report, json.load(file), args.max_regression):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
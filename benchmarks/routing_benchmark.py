@@ -0,0 +1,103 @@
+"""
+Micro-benchmark of query routing: the original keyword cascade versus the
+compiled single-pass KeywordRouter. Run from the repository root:
+
+    python -m benchmarks.routing_benchmark
+"""
+import timeit
+from multi_agent_system.router import KEYWORD_ROUTER
+
+QUESTIONS = [
+    "What is a DDoS attack?",
+    "I am at room 1, what should I do?",
+    "What is 5+5?",
+    "What is DNS?",
+    "Is earth flat?",
+    "I am at 'Room 1'. What is my task here?",
+    "What is Phishing?",
+    "What are cybersecurity best practices?",
+    "What is IoT?",
+    "What is VPN?",
+    "What is Malware?",
+    "Call me Sarah.",
+    "Who are you?",
+    "How can I move forward?",
+    "How can I summon Robi?",
+    "How can I grab things?",
+    "Do I just bend and press a button to pick up an object?",
+    "How do I click on icons in the UI?",
+    "where am i, roomname: room3",
+    "I am looking at a cube that has an exit sign on it, what does it mean?",
+    "where am i? What is my task here? roomname: room3",
+    "What is cybersecurity? What is Phishing?",
+    "Can you call me Noah moving forward? what is DDoS attack?",
+    "how can i tell if an ip is safe?",
+    "Good job, what kids games are there?",
+]
+
+
+def legacy_detect_query_type(query: str) -> str:
+    """
+    The original AgentCoordinator.detect_query_type, kept for comparison.
+    """
+    query_lower = query.lower()
+    location_keywords = ['room', 'location', 'where', 'place', 'area', 'task', 'cube']
+    security_keywords = [
+        'security', 'cyber', 'attack', 'threat', 'protection', 'ddos', 'dns',
+        'firewall', 'encryption', 'malware', 'phishing', 'ransomware',
+        'vulnerability', 'penetration', 'breach', 'authentication', 'intrusion',
+        'zero-day', 'exploit', 'mitigation', 'defense', 'incident', 'forensics',
+        'safety', 'network security', 'data breach', 'password', 'access control',
+        'ids', 'ips', 'iot security', 'cloud security', 'endpoint security',
+        'web security', 'mobile security'
+    ]
+    system_keywords = [
+        'controller', 'system', 'asset', 'configuration', 'architecture',
+        'setup', 'installation', 'framework', 'protocol', 'integration',
+        'hardware', 'software', 'deployment', 'infrastructure', 'operating system',
+        'network', 'server', 'database', 'automation', 'monitoring',
+        'maintenance', 'device', 'tool', 'resource management', 'scalability'
+    ]
+    navigation_keywords = [
+        'move', 'go', 'navigate', 'walk', 'forward', 'backward', 'strafe',
+        'left', 'right', 'joystick', 'speed', 'pace', 'rotate', 'turn',
+        'perspective', 'direction', 'adjust', 'push', 'pressure', 'click',
+        'button', 'trigger', 'grip', 'a button', 'b button',
+        'interact', 'grab', 'hold', 'drop', 'summon', 'robi',
+        'object', 'icon', 'box', 'select', 'outline', 'highlight',
+        'hover', 'conversation', 'appear', 'materialize', 'hear',
+        'respond', 'audio input', 'release', 'troubleshoot'
+    ]
+
+    if any(keyword in query_lower for keyword in location_keywords):
+        return "location"
+    elif any(keyword in query_lower for keyword in security_keywords):
+        return "cybersecurity"
+    elif any(keyword in query_lower for keyword in system_keywords):
+        return "system"
+    elif any(keyword in query_lower for keyword in navigation_keywords):
+        return "navigation"
+    return "other"
+
+
+def per_call_us(func, repeat: int = 5, number: int = 200) -> float:
+    """
+    Best-of-`repeat` average cost of routing one question, in microseconds.
+    """
+    def run():
+        for question in QUESTIONS:
+            func(question)
+    best = min(timeit.repeat(run, repeat=repeat, number=number))
+    return best / (number * len(QUESTIONS)) * 1e6
+
+
+if __name__ == "__main__":
+    legacy = per_call_us(legacy_detect_query_type)
+    compiled = per_call_us(KEYWORD_ROUTER.detect)
+    print(f"legacy cascade : {legacy:6.2f} us/query")
+    print(f"compiled router: {compiled:6.2f} us/query ({legacy / compiled:.1f}x)")
+    print("\nRouting differences:")
+    for question in QUESTIONS:
+        before, after = legacy_detect_query_type(question), KEYWORD_ROUTER.rank(question)
+        if before != after[0][0]:
+            print(f"  {question!r}: {before} -> {after}")
@@ -2,39 +2,122 @@ from dotenv import load_dotenv
 load_dotenv()  # Load environment variables early
 
 import os
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, request, jsonify, stream_with_context
 from multi_agent_system.resource_manager import ResourceManager
 from multi_agent_system.agent_coordinator import AgentCoordinator
+from multi_agent_system.llm_backend import create_backend
+from multi_agent_system.faq_store import FaqStore, FAQ_DIR
+from multi_agent_system.metrics import METRICS
+from multi_agent_system.structured_logging import configure_logging, new_request_id
+from multi_agent_system.scheduler import PRIORITIES, RateLimitedError
+
+# JSON-lines logs written by a background thread (LOG_LEVEL, LOG_SAMPLE_RATE).
+configure_logging()
+
+# LLM_BACKEND=local runs fully offline with a simulated model (no API key needed).
+backend = create_backend()
 
 # Optional: Check that the API key is loaded
-if not os.getenv("GOOGLE_API_KEY"):
+if backend.name == "gemini" and not os.getenv("GOOGLE_API_KEY"):
     raise Exception("GOOGLE_API_KEY is not set. Please check your .env file.")
 
 app = Flask(__name__)
 
 # Initialize resources and agent coordinator at startup
-resource_manager = ResourceManager(resource_dir="uSucceed_resource")
+resource_manager = ResourceManager(
+    resource_dir="uSucceed_resource",
+    dense_index=os.getenv("DENSE_INDEX", "").lower() in ("1", "true", "yes"),
+    backend=backend,
+)
 resource_manager.load_resources()
-coordinator = AgentCoordinator(resource_manager)
+# Precomputed answers to frequent questions (built with `python -m multi_agent_system.faq_store`).
+faq_store = FaqStore(os.path.join(resource_manager.resource_dir, FAQ_DIR))
+coordinator = AgentCoordinator(resource_manager, backend=backend, faq_store=faq_store)
+
+# Optionally reload automatically whenever the resource directory changes.
+if os.getenv("WATCH_RESOURCES", "").lower() in ("1", "true", "yes"):
+    resource_manager.start_watching()
 
 @app.route("/reload_resource", methods=["GET"])
 def reload_resource():
+    # Requests keep being served from the current snapshot while reloading.
+    if request.args.get('background', '').lower() in ("1", "true", "yes"):
+        resource_manager.reload_in_background()
+        return jsonify({"detail": "Resource reload started."}), 202
     try:
         resource_manager.load_resources()
         return jsonify({"detail": "Resources reloaded successfully."}), 200
     except Exception as e:
         return jsonify({"detail": f"Failed to reload resources: {str(e)}"}), 500
 
+def get_session_id():
+    # Each headset sends its own session id; fall back to the client address.
+    return request.args.get('session_id') or request.remote_addr
+
+def get_request_id():
+    # Propagate the caller's request id into the logs, or start a new one.
+    return request.headers.get("X-Request-ID") or new_request_id()
+
+def get_timeout():
+    # Seconds the client is willing to wait; the agents' defaults apply when absent.
+    return request.args.get('timeout', type=float)
+
+def get_priority():
+    # Headsets are interactive by default; evaluation scripts send priority=batch.
+    return request.args.get('priority', 'interactive')
+
 @app.route("/ask", methods=["GET"])
 def ask_question():
     query = request.args.get('query')
     if not query:
         return jsonify({"detail": "Query not provided"}), 400
+    priority = get_priority()
+    if priority not in PRIORITIES:
+        return jsonify({"detail": f"Unknown priority; expected one of {', '.join(PRIORITIES)}"}), 400
     try:
-        answer, timings = coordinator.route_query(query)
-        return jsonify({"query": query, "answer": answer, "timings": timings}), 200
+        request_id = get_request_id()
+        answer, timings = coordinator.route_query(query, session_id=get_session_id(), request_id=request_id,
+                                                  priority=priority, timeout=get_timeout())
+        return jsonify({"query": query, "answer": answer, "timings": timings}), 200, {"X-Request-ID": request_id}
+    except RateLimitedError as e:
+        return jsonify({"detail": str(e)}), 503, {"Retry-After": "5"}
     except Exception as e:
         return jsonify({"detail": str(e)}), 500
 
+@app.route("/ask_stream", methods=["GET"])
+def ask_question_stream():
+    """
+    Server-Sent Events version of /ask: one `data` event per answer chunk
+    (sentence-sized), then a `done` event with the timings.
+    """
+    query = request.args.get('query')
+    if not query:
+        return jsonify({"detail": "Query not provided"}), 400
+    priority = get_priority()
+    if priority not in PRIORITIES:
+        return jsonify({"detail": f"Unknown priority; expected one of {', '.join(PRIORITIES)}"}), 400
+    session_id = get_session_id()
+    request_id = get_request_id()
+    timeout = get_timeout()
+
+    def events():
+        timings = {}
+        try:
+            for chunk in coordinator.stream_query(query, session_id=session_id, timings=timings,
+                                                  request_id=request_id, priority=priority, timeout=timeout):
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'query': query, 'timings': timings})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-ID": request_id})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text exposition format: latency histograms, caches, sessions, reloads.
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -1,73 +1,480 @@
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from .session_store import SessionStore
+from .answer_cache import AnswerCache, normalize_query
+from .semantic_cache import SemanticCache
+from .single_flight import SingleFlight
+from .faq_store import build_faq
+from .scheduler import create_scheduler, priority_context
+from .deadlines import DEADLINES_EXCEEDED, DeadlineExceeded, deadline_context
+from .router import KEYWORD_ROUTER, split_compound_query
+from .intent_classifier import IntentClassifier
+from .metrics import METRICS, COALESCED_REQUESTS, span, record_stage, record_request, track_in_flight
+from .structured_logging import log_event, request_context
+
+logger = logging.getLogger(__name__)
+
 class AgentCoordinator:
     """
     Routes incoming queries to the appropriate specialized agent.
     """
-    def __init__(self, resource_manager):
+    def __init__(self, resource_manager, session_capacity: int = 512, session_ttl: float = 1800.0,
+                 min_intent_confidence: float = 0.6, max_parallel_questions: int = 8, backend=None,
+                 scheduler=None, faq_store=None):
         self.resource_manager = resource_manager
-        self.user_cache = {"USER": "User"}  # Shared user cache across agents
+        self.backend = backend or resource_manager.backend  # One LLM backend for uploads and answers
+        self.scheduler = scheduler or create_scheduler()  # Every agent's model calls share its rate limits
+        self.sessions = SessionStore(capacity=session_capacity, idle_ttl=session_ttl)
+        self.answer_cache = AnswerCache()
+        self.semantic_cache = SemanticCache()
+        self.single_flight = SingleFlight()  # Identical concurrent questions share one model call
+        # Precomputed answers (FaqStore), served only while built from the loaded resources.
+        self.faq_store = faq_store
+        self._faq_rebuild_lock = threading.Lock()
+        self.router = KEYWORD_ROUTER
+        # Learned router; the keyword router is used when it is unsure or unavailable.
+        self.min_intent_confidence = min_intent_confidence
+        try:
+            self.intent_classifier = IntentClassifier.load_or_train()
+        except Exception as e:
+            logger.warning("Intent classifier unavailable, using keyword routing only: %s", e)
+            self.intent_classifier = None
+        resource_manager.add_reload_listener(lambda snapshot: self.clear_caches())
+        self._register_metrics()
+        # Sub-questions of compound queries are answered concurrently.
+        self.executor = ThreadPoolExecutor(max_workers=max_parallel_questions, thread_name_prefix="sub-question")
         from .agents.location_agent import LocationAgent
         from .agents.navigation_agent import NavigationAgent
         from .agents.cybersecurity_agent import CybersecurityAgent
         from .agents.system_agent import SystemAgent
         from .agents.generic_agent import GenericAgent
 
+        # Agents look up the default session in the store on each call, so it survives eviction.
+        agent_options = {"answer_cache": self.answer_cache, "backend": self.backend, "scheduler": self.scheduler,
+                         "sessions": self.sessions}
         self.agents = {
-            "location": LocationAgent(resource_manager, self.user_cache),
-            "navigation": NavigationAgent(resource_manager, self.user_cache),
-            "cybersecurity": CybersecurityAgent(resource_manager, self.user_cache),
-            "system": SystemAgent(resource_manager, self.user_cache),
-            "other": GenericAgent(resource_manager, self.user_cache),
+            "location": LocationAgent(resource_manager, None, **agent_options),
+            "navigation": NavigationAgent(resource_manager, None, **agent_options),
+            "cybersecurity": CybersecurityAgent(resource_manager, None, **agent_options),
+            "system": SystemAgent(resource_manager, None, **agent_options),
+            "other": GenericAgent(resource_manager, None, **agent_options),
         }
+        if self.faq_store is not None:
+            resource_manager.add_reload_listener(self._refresh_faq)
+            self._refresh_faq(resource_manager.snapshot)
+
+    @property
+    def user_cache(self) -> dict:
+        """Default session, used when no session id is given."""
+        return self.sessions.get()
+
+    def _register_metrics(self):
+        """
+        Exposes session and cache statistics on /metrics (read at scrape time).
+        """
+        caches = {"answer": self.answer_cache, "semantic": self.semantic_cache}
+        if self.faq_store is not None:
+            caches["faq"] = self.faq_store
+        METRICS.gauge("robi_sessions", "Active user sessions.", function=lambda: len(self.sessions))
+        METRICS.gauge("robi_session_memory_bytes", "Approximate memory held by session state.",
+                      function=self.sessions.memory_usage)
+        METRICS.gauge("robi_conversation_history_tokens", "Estimated tokens of conversation memory held, by agent.",
+                      ("agent",), function=lambda: {(agent,): tokens
+                                                    for agent, tokens in self.sessions.history_tokens().items()})
+        METRICS.counter("robi_cache_hits_total", "Cache hits, by cache.", ("cache",),
+                        function=lambda: {(name,): cache.hits for name, cache in caches.items()})
+        METRICS.counter("robi_cache_misses_total", "Cache misses, by cache.", ("cache",),
+                        function=lambda: {(name,): cache.misses for name, cache in caches.items()})
+        METRICS.gauge("robi_cache_hit_ratio", "Share of lookups served from each cache.", ("cache",),
+                      function=lambda: {(name,): cache.hits / max(cache.hits + cache.misses, 1)
+                                        for name, cache in caches.items()})
+        METRICS.gauge("robi_cache_entries", "Entries held by each cache.", ("cache",),
+                      function=lambda: {(name,): len(cache) for name, cache in caches.items()})
+        METRICS.gauge("robi_single_flight_calls", "Distinct questions currently being generated.",
+                      function=lambda: len(self.single_flight))
+
+    def classify_query(self, query: str):
+        """
+        Returns (query_type, confidence). The intent classifier decides when it
+        is confident enough; otherwise the keyword router does.
+        """
+        if self.intent_classifier is not None:
+            query_type, confidence = self.intent_classifier.predict(query)
+            if confidence >= self.min_intent_confidence and query_type in self.agents:
+                return query_type, confidence
+            return self.router.detect(query), confidence
+        return self.router.detect(query), 0.0
 
     def detect_query_type(self, query: str) -> str:
         """
-        Determines the query type based on a set of keywords.
-        """
-        query_lower = query.lower()
-        location_keywords = ['room', 'location', 'where', 'place', 'area', 'task', 'cube']
-        security_keywords = [
-            'security', 'cyber', 'attack', 'threat', 'protection', 'ddos', 'dns',
-            'firewall', 'encryption', 'malware', 'phishing', 'ransomware',
-            'vulnerability', 'penetration', 'breach', 'authentication', 'intrusion',
-            'zero-day', 'exploit', 'mitigation', 'defense', 'incident', 'forensics',
-            'safety', 'network security', 'data breach', 'password', 'access control',
-            'ids', 'ips', 'iot security', 'cloud security', 'endpoint security',
-            'web security', 'mobile security'
-        ]
-        system_keywords = [
-            'controller', 'system', 'asset', 'configuration', 'architecture',
-            'setup', 'installation', 'framework', 'protocol', 'integration',
-            'hardware', 'software', 'deployment', 'infrastructure', 'operating system',
-            'network', 'server', 'database', 'automation', 'monitoring',
-            'maintenance', 'device', 'tool', 'resource management', 'scalability'
-        ]
-        navigation_keywords = [
-            'move', 'go', 'navigate', 'walk', 'forward', 'backward', 'strafe',
-            'left', 'right', 'joystick', 'speed', 'pace', 'rotate', 'turn',
-            'perspective', 'direction', 'adjust', 'push', 'pressure', 'click',
-            'button', 'trigger', 'grip', 'a button', 'b button',
-            'interact', 'grab', 'hold', 'drop', 'summon', 'robi',
-            'object', 'icon', 'box', 'select', 'outline', 'highlight',
-            'hover', 'conversation', 'appear', 'materialize', 'hear',
-            'respond', 'audio input', 'release', 'troubleshoot'
-        ]
-
-        if any(keyword in query_lower for keyword in location_keywords):
-            return "location"
-        elif any(keyword in query_lower for keyword in security_keywords):
-            return "cybersecurity"
-        elif any(keyword in query_lower for keyword in system_keywords):
-            return "system"
-        elif any(keyword in query_lower for keyword in navigation_keywords):
-            return "navigation"
-        return "other"
-
-    def route_query(self, query: str):
+        Determines the query type with the intent classifier, falling back
+        to a set of keywords.
+        """
+        return self.classify_query(query)[0]
+
+    def rank_query_types(self, query: str):
+        """
+        Returns every matching query type with its keyword score, best first.
+        """
+        return self.router.rank(query)
+
+    def clear_caches(self):
+        """
+        Drops cached answers; called whenever the resources are reloaded.
+        """
+        self.answer_cache.clear()
+        self.semantic_cache.clear()
+
+    def _refresh_faq(self, snapshot):
+        """
+        Serves the FAQ store only while it was built from the snapshot's
+        PDFs; a stale store is rebuilt in the background with its questions.
+        """
+        if not snapshot.version:
+            return
+        self.faq_store.active = self.faq_store.matches(snapshot.fingerprint)
+        if not self.faq_store.active and self.faq_store.questions:
+            threading.Thread(target=self._rebuild_faq, name="faq-rebuild", daemon=True).start()
+
+    def _rebuild_faq(self):
+        if not self._faq_rebuild_lock.acquire(blocking=False):
+            return  # A rebuild is running; it repeats if the resources changed meanwhile
+        try:
+            with priority_context("batch"):
+                while not self.faq_store.matches(self.resource_manager.snapshot.fingerprint):
+                    log_event(logger, logging.INFO, "Rebuilding stale FAQ store",
+                              questions=len(self.faq_store.questions))
+                    build_faq(self, self.faq_store.questions, self.faq_store)
+            self.faq_store.active = True
+        except Exception:
+            logger.exception("FAQ store rebuild failed; questions go to the agents")
+        finally:
+            self._faq_rebuild_lock.release()
+
+    def _answer_from_faq(self, query: str, user_cache: dict, timings: dict, start_time: float):
+        """
+        Returns the precomputed answer to the question for this user, or None.
+        Name statements update the session, so they always go to the agents.
+        """
+        if self.faq_store is None or self.agents["other"].extract_user_name(query) is not None:
+            return None
+        found = self.faq_store.lookup(query, user_cache.get("USER", "User"))
+        if found is None:
+            return None
+        answer, query_type, match = found
+        self.agents.get(query_type, self.agents["other"])._remember(user_cache, query, answer)
+        timings["faq_hit"] = 1
+        timings["faq_near_match"] = 1 if match == "near" else 0
+        timings["total_time"] = record_request(query_type, start_time, "ok")
+        self._log_answer(query, query_type, timings)
+        return answer
+
+    def _split(self, query: str):
+        return split_compound_query(
+            query, lambda fragment: self.agents["other"].extract_user_name(fragment) is not None)
+
+    @staticmethod
+    def _merge_parts(parts, start_time: float):
+        """
+        Joins sub-answers in order and flattens their timings as q<n>_<key>.
+        """
+        timings = {"sub_questions": len(parts)}
+        for number, (_, sub_timings) in enumerate(parts, start=1):
+            for key, value in sub_timings.items():
+                timings[f"q{number}_{key}"] = value
+        timings["total_time"] = time.perf_counter() - start_time
+        return "\n".join(answer.strip() for answer, _ in parts), timings
+
+    def _select_agent(self, query: str, timings: dict, action: str = "Routing"):
+        routing_start = time.perf_counter()
+        query_type, confidence = self.classify_query(query)
+        record_stage(timings, "routing", query_type, time.perf_counter() - routing_start)
+        timings["route_confidence"] = confidence
+        log_event(logger, logging.DEBUG, f"{action} query", agent=query_type, confidence=confidence, query=query)
+        return query_type, self.agents.get(query_type, self.agents["other"])
+
+    def _check_semantic_cache(self, query: str, query_type: str, agent, user_cache: dict, version: int):
+        """
+        Returns (embedding, cached) where cached is (answer, similarity) or None.
+        Only answers generated from resource snapshot `version` are served.
+        Name statements update the session, so they always go to the agent.
+        """
+        if agent.extract_user_name(query) is not None:
+            return None, None
+        embedding = self.semantic_cache.embed(query)
+        return embedding, self.semantic_cache.get(query_type, query, embedding, user_cache.get("USER", "User"),
+                                                  version)
+
+    def _store_semantic_answer(self, query: str, query_type: str, agent, embedding, answer: str, user_cache: dict,
+                               version: int, timings: dict):
+        # Tagged with the snapshot the request started on, so a reload in the meantime discards it.
+        # Answers shaped by the session's conversation history are not shared.
+        if embedding is not None and not timings.get("history_tokens"):
+            user_name = user_cache.get("USER", "User") if agent.uses_user_name else None
+            self.semantic_cache.put(query_type, query, embedding, answer, user_name, version)
+
+    def _flight_key(self, query: str, query_type: str, agent, user_cache: dict):
+        """
+        Returns (key, user_name) for coalescing the question with identical
+        ones in flight, or (None, None) if it must be answered on its own.
+        Name statements update the session, and answers built on the
+        session's conversation history are specific to it, so neither is shared.
+        """
+        if agent.extract_user_name(query) is not None or agent.has_history(user_cache):
+            return None, None
+        user_name = user_cache.get("USER", "User") if agent.uses_user_name else None
+        return (query_type, normalize_query(query)), user_name
+
+    def _coalesced_answer(self, query: str, query_type: str, agent, template: str, user_name: str,
+                          user_cache: dict, start_time: float):
+        """
+        Personalizes an answer generated for another caller and records it
+        in this session's conversation memory.
+        """
+        answer = AnswerCache.fill_template(template, user_name) if user_name else template
+        agent._remember(user_cache, query, answer)
+        COALESCED_REQUESTS.inc(agent=query_type)
+        return answer, {"coalesced": 1, "coalesced_wait_time": time.perf_counter() - start_time}
+
+    def _ask_agent(self, query: str, query_type: str, agent, user_cache: dict):
+        """
+        Answers with the agent; identical questions already in flight for
+        the agent are waited on instead of generated again, with the
+        caller's name filled in.
+        """
+        key, user_name = self._flight_key(query, query_type, agent, user_cache)
+        if key is None:
+            return agent.get_answer(query, user_cache)
+
+        def generate():
+            answer, timings = agent.get_answer(query, user_cache)
+            return AnswerCache.to_template(answer, user_name), timings
+
+        start_time = time.perf_counter()
+        (template, timings), shared = self.single_flight.do(key, generate)
+        if not shared:
+            return AnswerCache.fill_template(template, user_name) if user_name else template, timings
+        return self._coalesced_answer(query, query_type, agent, template, user_name, user_cache, start_time)
+
+    async def _ask_agent_async(self, query: str, query_type: str, agent, user_cache: dict):
+        key, user_name = self._flight_key(query, query_type, agent, user_cache)
+        if key is None:
+            return await agent.get_answer_async(query, user_cache)
+
+        async def generate():
+            answer, timings = await agent.get_answer_async(query, user_cache)
+            return AnswerCache.to_template(answer, user_name), timings
+
+        start_time = time.perf_counter()
+        (template, timings), shared = await self.single_flight.do_async(key, generate)
+        if not shared:
+            return AnswerCache.fill_template(template, user_name) if user_name else template, timings
+        return self._coalesced_answer(query, query_type, agent, template, user_name, user_cache, start_time)
+
+    def _submit(self, func, *args):
+        # Pool threads run with the caller's context, so their logs keep the request id.
+        return self.executor.submit(contextvars.copy_context().run, func, *args)
+
+    def _log_answer(self, query: str, query_type: str, timings: dict, outcome: str = "ok"):
+        level, event = {
+            "ok": (logging.INFO, "Answered question"),
+            "deadline": (logging.WARNING, "Answered with the fallback after the deadline"),
+        }.get(outcome, (logging.ERROR, "Question failed"))
+        log_event(logger, level, event, agent=query_type, query=query[:200], timings=dict(timings),
+                  exc_info=outcome == "error")
+
+    def _fallback(self, query: str, query_type: str, agent, timings: dict) -> str:
+        timings["deadline_exceeded"] = 1
+        DEADLINES_EXCEEDED.inc(agent=query_type)
+        return agent.fallback_answer(query)
+
+    def route_query(self, query: str, session_id: str = None, request_id: str = None, priority: str = None,
+                    timeout: float = None):
         """
         Routes the query to the appropriate agent based on its type.
+        The session id selects the per-user state (e.g., the user's name).
+        Compound queries ("What is DNS? What is phishing?") are split; each
+        sub-question is routed on its own and all are answered concurrently,
+        then merged in their original order. `priority` ("interactive" or
+        "batch") orders its model calls against other requests'. `timeout`
+        (seconds) is the deadline for the whole query; a question still
+        unanswered by then gets its agent's fast fallback answer.
         """
-        query_type = self.detect_query_type(query)
-        print(f"Routing query '{query}' to agent type '{query_type}'")
-        agent = self.agents.get(query_type, self.agents["other"])
-        answer, timings = agent.get_answer(query)
+        start_time = time.perf_counter()
+        with track_in_flight(), request_context(request_id), priority_context(priority), \
+                deadline_context(timeout):
+            user_cache = self.sessions.get(session_id)
+            names, questions = self._split(query)
+            if len(questions) == 1:
+                return self._route_single(questions[0], user_cache)
+
+            # Name statements change the session, so they are handled before the questions.
+            parts = [self._route_single(name, user_cache) for name in names]
+            futures = [self._submit(self._route_single, question, user_cache) for question in questions]
+            parts += [future.result() for future in futures]
+            return self._merge_parts(parts, start_time)
+
+    def _route_single(self, query: str, user_cache: dict):
+        """
+        Routes a single question to its agent. Frequent questions are
+        answered from the FAQ store without routing, paraphrases of earlier
+        questions from the semantic cache, and identical questions already
+        being answered share that answer.
+        """
+        start_time = time.perf_counter()
+        timings = {}
+        answer = self._answer_from_faq(query, user_cache, timings, start_time)
+        if answer is not None:
+            return answer, timings
+        outcome = "ok"
+        query_type, agent = self._select_agent(query, timings)
+        version = self.resource_manager.snapshot.version
+        try:
+            with span(timings, "semantic_cache", query_type):
+                embedding, cached = self._check_semantic_cache(query, query_type, agent, user_cache, version)
+            if cached is not None:
+                answer, timings["similarity"] = cached
+                timings["semantic_cache_hit"] = 1
+            else:
+                answer, agent_timings = self._ask_agent(query, query_type, agent, user_cache)
+                timings.update(agent_timings)
+                self._store_semantic_answer(query, query_type, agent, embedding, answer, user_cache, version,
+                                            timings)
+        except DeadlineExceeded:
+            answer, outcome = self._fallback(query, query_type, agent, timings), "deadline"
+        except Exception:
+            timings["total_time"] = record_request(query_type, start_time, "error")
+            self._log_answer(query, query_type, timings, "error")
+            raise
+        timings["total_time"] = record_request(query_type, start_time, outcome)
+        self._log_answer(query, query_type, timings, outcome)
+        return answer, timings
+
+    async def route_query_async(self, query: str, session_id: str = None, request_id: str = None,
+                                priority: str = None, timeout: float = None):
+        """
+        Asyncio variant of route_query: model calls are awaited instead of
+        holding a thread, and sub-questions are gathered concurrently.
+        """
+        start_time = time.perf_counter()
+        with track_in_flight(), request_context(request_id), priority_context(priority), \
+                deadline_context(timeout):
+            user_cache = self.sessions.get(session_id)
+            names, questions = self._split(query)
+            if len(questions) == 1:
+                return await self._route_single_async(questions[0], user_cache)
+
+            parts = [await self._route_single_async(name, user_cache) for name in names]
+            parts += await asyncio.gather(*(self._route_single_async(question, user_cache) for question in questions))
+            return self._merge_parts(parts, start_time)
+
+    async def _route_single_async(self, query: str, user_cache: dict):
+        start_time = time.perf_counter()
+        timings = {}
+        answer = self._answer_from_faq(query, user_cache, timings, start_time)
+        if answer is not None:
+            return answer, timings
+        outcome = "ok"
+        query_type, agent = self._select_agent(query, timings)
+        version = self.resource_manager.snapshot.version
+        try:
+            # Embedding is CPU-bound; keep it off the event loop.
+            with span(timings, "semantic_cache", query_type):
+                embedding, cached = await asyncio.to_thread(
+                    self._check_semantic_cache, query, query_type, agent, user_cache, version)
+            if cached is not None:
+                answer, timings["similarity"] = cached
+                timings["semantic_cache_hit"] = 1
+            else:
+                answer, agent_timings = await self._ask_agent_async(query, query_type, agent, user_cache)
+                timings.update(agent_timings)
+                self._store_semantic_answer(query, query_type, agent, embedding, answer, user_cache, version,
+                                            timings)
+        except DeadlineExceeded:
+            answer, outcome = self._fallback(query, query_type, agent, timings), "deadline"
+        except Exception:
+            timings["total_time"] = record_request(query_type, start_time, "error")
+            self._log_answer(query, query_type, timings, "error")
+            raise
+        timings["total_time"] = record_request(query_type, start_time, outcome)
+        self._log_answer(query, query_type, timings, outcome)
         return answer, timings
+
+    def stream_query(self, query: str, session_id: str = None, timings: dict = None, request_id: str = None,
+                     priority: str = None, timeout: float = None):
+        """
+        Streaming variant of route_query: yields answer chunks as they are
+        generated and fills in `timings` (if given) when done. Sub-questions
+        of compound queries are still answered concurrently and streamed in
+        their original order.
+        """
+        timings = {} if timings is None else timings
+        start_time = time.perf_counter()
+        with track_in_flight(), request_context(request_id), priority_context(priority), \
+                deadline_context(timeout):
+            user_cache = self.sessions.get(session_id)
+            names, questions = self._split(query)
+            if len(questions) == 1:
+                yield from self._stream_single(questions[0], user_cache, timings)
+                return
+
+            number = 0
+            for number, name in enumerate(names, start=1):
+                answer, sub_timings = self._route_single(name, user_cache)
+                timings.setdefault("time_to_first_chunk", time.perf_counter() - start_time)
+                yield answer.strip() + "\n"
+                timings.update({f"q{number}_{key}": value for key, value in sub_timings.items()})
+            futures = [self._submit(self._route_single, question, user_cache) for question in questions]
+            for number, future in enumerate(futures, start=number + 1):
+                answer, sub_timings = future.result()
+                timings.setdefault("time_to_first_chunk", time.perf_counter() - start_time)
+                yield answer.strip() + "\n"
+                timings.update({f"q{number}_{key}": value for key, value in sub_timings.items()})
+            timings["sub_questions"] = number
+            timings["total_time"] = time.perf_counter() - start_time
+
+    def _stream_single(self, query: str, user_cache: dict, timings: dict):
+        """
+        Streams the answer to a single question from the FAQ store, the
+        semantic cache or its agent.
+        """
+        start_time = time.perf_counter()
+        answer = self._answer_from_faq(query, user_cache, timings, start_time)
+        if answer is not None:
+            timings["time_to_first_chunk"] = time.perf_counter() - start_time
+            yield answer
+            return
+        outcome = "ok"
+        chunks = []
+        query_type, agent = self._select_agent(query, timings, action="Streaming")
+        version = self.resource_manager.snapshot.version
+        try:
+            with span(timings, "semantic_cache", query_type):
+                embedding, cached = self._check_semantic_cache(query, query_type, agent, user_cache, version)
+            if cached is not None:
+                answer, timings["similarity"] = cached
+                timings["semantic_cache_hit"] = 1
+                timings["time_to_first_chunk"] = time.perf_counter() - start_time
+                yield answer
+            else:
+                for chunk in agent.stream_answer(query, user_cache, timings):
+                    if not chunks:
+                        timings["time_to_first_chunk"] = time.perf_counter() - start_time
+                    chunks.append(chunk)
+                    yield chunk
+                self._store_semantic_answer(query, query_type, agent, embedding, "".join(chunks), user_cache,
+                                            version, timings)
+        except DeadlineExceeded:
+            # Only reached before the first model chunk; a started stream runs to the end.
+            outcome = "deadline"
+            yield self._fallback(query, query_type, agent, timings)
+        except Exception:
+            timings["total_time"] = record_request(query_type, start_time, "error")
+            self._log_answer(query, query_type, timings, "error")
+            raise
+        timings["total_time"] = record_request(query_type, start_time, outcome)
+        self._log_answer(query, query_type, timings, outcome)
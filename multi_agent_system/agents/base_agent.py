@@ -1,40 +1,70 @@
 import re
 import time
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import asyncio
+import logging
+import itertools
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from ..chat_pool import ChatSessionPool
+from ..conversation_memory import ConversationMemory, estimate_tokens
+from ..deadlines import HEDGED_CALLS, LatencyWindow, deadline_context, hedged_call, hedged_call_async
+from ..llm_backend import GeminiBackend
+from ..metrics import span
+from ..prompt_template import PromptTooLongError
+from ..retrieval import preprocess
+from ..scheduler import RequestScheduler
+from ..structured_logging import log_event
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")  # Where streamed answers are flushed
+# Document headers and footers (handling markings, contact details, page numbers, links) never answer a question.
+BOILERPLATE = re.compile(r"\bTLP:|\S@\S|https?://|\bwww\.|\b\d{3}[.-]\d{3}[.-]\d{4}\b|\bPage \d+ of \d+|\baccessed\b",
+                         re.IGNORECASE)
+WORD = re.compile(r"[a-z0-9]+")
+
+logger = logging.getLogger(__name__)
 
 class BaseAgent:
     """
     Base class for AI agents. Handles common configuration,
     user name extraction, and query processing.
     """
-    def __init__(self, resource_manager, user_cache: dict, agent_type: str):
+    uses_user_name = False  # Whether the prompt (and so the answer) mentions the user's name
+    retrieval_k = 4  # Number of retrieved passages to include in the prompt (0 disables retrieval)
+    max_passage_chars = None  # Retrieved passages are cut to about this many characters (None keeps them whole)
+    memory_turns = 4  # Past exchanges per session kept verbatim (0 disables conversation memory)
+    memory_summary_tokens = 256  # Token budget for the summary of older exchanges
+    memory_turn_tokens = 1024  # Token budget for the exchanges kept verbatim; older ones are folded
+    prompt_template = None  # PromptTemplate compiled once per agent class
+    chat_pool_size = 8  # Idle chat sessions kept for reuse; busier agents create more on demand
+    max_prompt_tokens = 3000  # Budget for prompt plus conversation memory; memory and passages are trimmed to fit
+    timeout = 10.0  # Seconds the model may take before the request falls back to a local answer
+    hedge_percentile = 95  # Model calls slower than this recent latency percentile are hedged (None disables)
+    fallback_text = "[beep] My circuits are running slow right now. Please try again in a moment."
+    fallback_min_score = 0.15  # Keyword similarity a passage needs to be quoted in a fallback answer
+
+    def __init__(self, resource_manager, user_cache: dict, agent_type: str, answer_cache=None, backend=None,
+                 scheduler=None, sessions=None):
         self.resource_manager = resource_manager
-        self.user_cache = user_cache  # Shared cache (e.g., for user name)
+        self._user_cache = user_cache
+        self.sessions = sessions  # Optional SessionStore holding the default session
         self.agent_type = agent_type
-        self._configure_genai()
-
-    def _configure_genai(self):
-        """
-        Configures the Gemini generative model with safety settings.
-        """
-        self.safety_settings = {
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        generation_config = {
-            "temperature": 0,
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-        }
-        self.model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash", generation_config=generation_config
-        )
-        self.chat_session = self.model.start_chat()
+        self.answer_cache = answer_cache  # Optional AnswerCache shared by all agents
+        self._configure_backend(backend)  # Optional LLMBackend shared by all agents
+        self.scheduler = scheduler or RequestScheduler()  # Rate limits and retries for every model call
+        self.latencies = LatencyWindow()  # Recent model call latencies, for hedging
+
+    @property
+    def user_cache(self) -> dict:
+        """Default session state (e.g., for user name), used when a call gives none."""
+        return self.sessions.get() if self.sessions is not None else self._user_cache
+
+    def _configure_backend(self, backend):
+        """
+        Configures the language model backend (Gemini unless another is given)
+        and the pool of chat sessions concurrent requests check out.
+        """
+        self.backend = backend or GeminiBackend()
+        self.safety_settings = self.backend.safety_settings
+        self.chat_pool = ChatSessionPool(self.backend, self.chat_pool_size, self.agent_type)
 
     @staticmethod
     def extract_user_name(query: str) -> str:
@@ -47,84 +77,440 @@ class BaseAgent:
             return next(filter(None, match.groups()))
         return None
 
-    def generate_prompt(self, query: str) -> str:
+    @staticmethod
+    def format_passages(passages, max_chars: int = None) -> str:
+        """
+        Formats retrieved passages as a prompt section (empty if there are none),
+        each cut at a word boundary to at most `max_chars` characters if given.
+        """
+        if not passages:
+            return ""
+        lines = []
+        for passage in passages:
+            text = passage.text
+            if max_chars is not None and len(text) > max_chars:
+                text = text[:max_chars].rsplit(" ", 1)[0] + " ..."
+            lines.append(f"- ({passage.source}) {text}")
+        return "Relevant passages from the provided documents:\n" + "\n".join(lines) + "\n"
+
+    def format_context(self, passages) -> str:
+        """
+        Formats the retrieved passages for the prompt's {context} field.
+        """
+        return self.format_passages(passages, self.max_passage_chars)
+
+    def generate_prompt(self, query: str, user_name: str = "User", passages=()) -> str:
+        """
+        Renders the agent's precompiled prompt template: the static prefix
+        followed by the suffix filled in for this request.
+        """
+        return self.prompt_template.render(query, user_name, self.format_context(passages))
+
+    def fit_prompt(self, query: str, user_name: str, passages, memory: ConversationMemory = None):
+        """
+        Renders the prompt within max_prompt_tokens, together with the
+        conversation memory sent as chat history. Until it fits, the oldest
+        verbatim exchanges are folded into the memory's summary, then the
+        lowest-ranked passages are dropped, and last the memory is left out
+        of this request. Returns (prompt, tokens, passages_kept,
+        history_tokens), with history_tokens 0 if the memory is left out;
+        raises PromptTooLongError if the question alone does not fit.
+        """
+        template = self.prompt_template
+        passages = list(passages)
+        history_tokens = memory.token_count() if memory is not None else 0
+        while True:
+            suffix = template.render_suffix(query, user_name, self.format_context(passages))
+            tokens = template.count_tokens(suffix)
+            if tokens + history_tokens <= self.max_prompt_tokens:
+                return template.prefix + suffix, tokens, len(passages), history_tokens
+            if history_tokens and memory.fold_oldest():
+                history_tokens = memory.token_count()
+            elif passages:
+                passages.pop()
+            elif history_tokens:
+                history_tokens = 0
+            else:
+                raise PromptTooLongError(
+                    f"{self.agent_type} prompt needs ~{tokens} tokens, over its budget of {self.max_prompt_tokens}.")
+
+    def _add_cache_timings(self, timings: dict, hit: bool):
+        """
+        Records the cache outcome and running hit/miss counters in the timings.
+        """
+        timings["cache_hit"] = 1 if hit else 0
+        timings["cache_hits"] = self.answer_cache.hits
+        timings["cache_misses"] = self.answer_cache.misses
+
+    def _update_user_name(self, query: str, user_cache: dict):
         """
-        Abstract method to generate a context-aware prompt.
-        Must be implemented by subclasses.
+        Stores a user name stated in the query. Returns (greeting, done):
+        the greeting is empty if the name did not change, and `done` is True
+        when the query holds nothing but the name statement.
         """
-        raise NotImplementedError("generate_prompt must be implemented by the agent subclass.")
+        old_user_name = user_cache.get("USER", "User")
+        new_user_name = self.extract_user_name(query)
+        if not new_user_name or new_user_name.lower() == "user" or new_user_name == old_user_name:
+            return "", False
+        user_cache["USER"] = new_user_name
+        pattern = r'(?<=[?.!])\s+'
+        sentences = re.split(pattern, query)
+        sentences = [sentence.strip() + (query[len(sentence):][0] if len(query) > len(sentence) else '') for sentence in sentences]
+        remaining_query = sentences[1] if len(sentences) > 1 else None
+        log_event(logger, logging.DEBUG, "Extracted user name", agent=self.agent_type, remaining_query=remaining_query)
+        greeting = f"Hi! {new_user_name}. Thank you for sharing your name. I will use this for future reference."
+        return greeting, remaining_query is None
+
+    def _get_cached_answer(self, query: str, user_name: str, timings: dict, version: int):
+        """
+        Returns this user's answer cached from resource snapshot `version`, or None.
+        """
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.get(self.agent_type, query, user_name, version)
+        self._add_cache_timings(timings, cached is not None)
+        return cached
+
+    def _cache_answer(self, query: str, answer: str, user_name: str, version: int, timings: dict):
+        # Cache the response with the user's name factored out, tagged with the
+        # snapshot it was generated from so a reload in the meantime discards it.
+        # Answers shaped by the session's conversation history are not shared.
+        if self.answer_cache is not None and not timings.get("history_tokens"):
+            self.answer_cache.put(self.agent_type, query, answer, user_name if self.uses_user_name else None,
+                                  version)
+
+    def _memory_for(self, user_cache: dict):
+        """
+        Returns this agent's conversation memory for the session, if enabled.
+        """
+        if not self.memory_turns:
+            return None
+        memories = user_cache.setdefault("MEMORY", {})
+        memory = memories.get(self.agent_type)
+        if memory is None:
+            memory = memories.setdefault(
+                self.agent_type,
+                ConversationMemory(self.memory_turns, self.memory_summary_tokens, self.memory_turn_tokens))
+        return memory
+
+    def has_history(self, user_cache: dict) -> bool:
+        """
+        Whether the session has conversation memory for this agent, which
+        would make its next answer specific to the session.
+        """
+        memory = user_cache.get("MEMORY", {}).get(self.agent_type)
+        return memory is not None and memory.token_count() > 0
+
+    def _remember(self, user_cache: dict, query: str, answer: str):
+        memory = self._memory_for(user_cache)
+        if memory is not None:
+            memory.add(query, answer)
 
-    def get_answer(self, query: str):
+    def retrieve(self, query: str, snapshot) -> list:
+        """
+        Returns the passages of the snapshot the answer should be based on.
+        """
+        if not self.retrieval_k:
+            return []
+        return self.resource_manager.search(query, self.agent_type, k=self.retrieval_k, snapshot=snapshot)
+
+    def _prepare_prompt(self, query: str, user_name: str, timings: dict, user_cache: dict):
+        """
+        Retrieves the relevant passages, generates the prompt and builds the
+        chat history from one resource snapshot and the session's bounded
+        conversation memory. Returns (prompt, history).
+        """
+        # Ensure resources are loaded; this request uses one snapshot throughout.
+        snapshot = self.resource_manager.snapshot
+        if not snapshot.version:
+            raise Exception("Resources not loaded. Please load resources first using ResourceManager.load_resources().")
+
+        # Retrieve only the passages relevant to this question.
+        with span(timings, "retrieval", self.agent_type):
+            passages = self.retrieve(query, snapshot)
+
+        # Render the precompiled template within the agent's token budget.
+        memory = self._memory_for(user_cache)
+        with span(timings, "prompt", self.agent_type):
+            prompt, prompt_tokens, kept, history_tokens = self.fit_prompt(query, user_name, passages, memory)
+        timings["prompt_chars"] = len(prompt)
+        timings["prompt_tokens"] = prompt_tokens
+        timings["prefix_tokens"] = self.prompt_template.prefix_tokens
+        if kept < len(passages):
+            timings["trimmed_passages"] = len(passages) - kept
+
+        # Build history with relevant file information
+        with span(timings, "history", self.agent_type):
+            history = []
+            if self.agent_type == "location":
+                # Include full content from prioritized files unless the
+                # relevant passages were already retrieved into the prompt.
+                for file in self.resource_manager.get_files_for_agent(self.agent_type, snapshot):
+                    if "Rooms_And_Tasks.pdf" in file.display_name and not passages:
+                        history.append({"role": "user", "parts": [file]})
+                    else:
+                        history.append({"role": "user", "parts": [f"Basic content from {file.display_name}"]})
+
+            if memory is not None:
+                if history_tokens:  # 0 when even the summary did not fit in this prompt
+                    history.extend(memory.as_history())
+                timings["history_tokens"] = history_tokens
+        # The scheduler is charged for everything sent: prompt, history and attached files.
+        timings["input_tokens"] = prompt_tokens + self._count_history_tokens(history, snapshot)
+        return prompt, history
+
+    @staticmethod
+    def _count_history_tokens(history: list, snapshot) -> int:
+        """
+        Estimated tokens of a chat history; attached files count as their extracted text.
+        """
+        file_texts = {file.name: snapshot.texts.get(path, "") for path, file in snapshot.files_by_path.items()}
+        return sum(estimate_tokens(part if isinstance(part, str) else file_texts.get(part.name, ""))
+                   for entry in history for part in entry["parts"])
+
+    def _send(self, prompt: str, history: list):
+        with self.chat_pool.session(history) as chat:
+            return chat.send_message(prompt, safety_settings=self.safety_settings)
+
+    async def _send_async(self, prompt: str, history: list):
+        with self.chat_pool.session(history) as chat:
+            return await chat.send_message_async(prompt, safety_settings=self.safety_settings)
+
+    def _hedge_after(self):
+        if self.hedge_percentile is None:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def _record_hedge(self, timings: dict, hedged: bool, winner: int):
+        if hedged:
+            timings["hedged"] = 1
+            HEDGED_CALLS.inc(agent=self.agent_type, winner=("primary", "hedge")[winner])
+
+    def _call_model(self, prompt: str, history: list, timings: dict, timeout: float = None):
+        """
+        Sends the prompt through the scheduler, within `timeout` seconds (the
+        agent's default if None) or the request's deadline if sooner. A call
+        still running after the agent's recent `hedge_percentile` latency is
+        duplicated and the first answer wins. Raises DeadlineExceeded.
+        """
+        def send():
+            # Timed from admission: hedging reacts to slow model calls, not to queueing.
+            start = time.perf_counter()
+            response = self._send(prompt, history)
+            self.latencies.observe(time.perf_counter() - start)
+            return response
+
+        def attempt():
+            return self.scheduler.call(send, timings["input_tokens"], timings=timings)
+
+        with deadline_context(self.timeout if timeout is None else timeout):
+            response, hedged, winner = hedged_call(attempt, self._hedge_after())
+        self._record_hedge(timings, hedged, winner)
+        return response
+
+    async def _call_model_async(self, prompt: str, history: list, timings: dict, timeout: float = None):
+        async def send():
+            start = time.perf_counter()
+            response = await self._send_async(prompt, history)
+            self.latencies.observe(time.perf_counter() - start)
+            return response
+
+        async def attempt():
+            return await self.scheduler.call_async(send, timings["input_tokens"], timings=timings)
+
+        with deadline_context(self.timeout if timeout is None else timeout):
+            response, hedged, winner = await hedged_call_async(attempt, self._hedge_after())
+        self._record_hedge(timings, hedged, winner)
+        return response
+
+    def fallback_answer(self, query: str) -> str:
+        """
+        Fast local answer for a question the model could not answer in time:
+        a complete sentence from the best matching passages, preferring the
+        one that shares the most words with the question, or a short
+        apology if no passage matches at least `fallback_min_score`.
+        Passages are cut mid-sentence, so fragments are skipped, as are
+        document headers and footers.
+        """
+        try:
+            passages = self.resource_manager.search(query, self.agent_type, k=4, dense=False)
+        except Exception:
+            passages = []
+        terms = set(WORD.findall(preprocess(query))) - ENGLISH_STOP_WORDS
+        best, best_matches = None, -1
+        for passage in passages:
+            if passage.score < self.fallback_min_score:
+                break
+            for sentence in SENTENCE_END.split(passage.text.strip()):
+                if not (sentence[:1].isupper() and sentence.endswith((".", "!", "?"))
+                        and len(sentence.split()) >= 4) or BOILERPLATE.search(sentence):
+                    continue
+                matches = len(terms.intersection(WORD.findall(preprocess(sentence))))
+                if matches > best_matches:
+                    best, best_matches = sentence, matches
+        if best is None:
+            return self.fallback_text
+        return f"Quick answer from my data banks: {best} [beep]"
+
+    def get_answer(self, query: str, user_cache: dict = None, timeout: float = None):
         """
         Processes the query by:
           - Checking/updating the user name.
+          - Serving repeated questions from the answer cache.
+          - Retrieving the passages relevant to the query.
           - Generating a context-specific prompt.
-          - Building the history using relevant resources.
-          - Sending the query to the Gemini chat session.
+          - Building the history using relevant resources and the session's
+            bounded conversation memory.
+          - Sending the query to a pooled chat session seeded with that history.
           - Caching and returning the answer along with execution timing.
+        `user_cache` is the calling session's state; it defaults to the agent's own.
+        `timeout` bounds the model call (see _call_model).
         """
+        if user_cache is None:
+            user_cache = self.user_cache
         timings = {}
-        start_time = time.time()
-        first_answer = ''
+        start_time = time.perf_counter()
 
         # Check for explicit user name in the query
-        old_user_name = self.user_cache.get("USER", "User")
-        new_user_name = self.extract_user_name(query)
-        if new_user_name and new_user_name.lower() != "user" and new_user_name != old_user_name:
-            self.user_cache["USER"] = new_user_name
-            pattern = r'(?<=[?.!])\s+'
-            sentences = re.split(pattern, query)
-            sentences = [sentence.strip() + (query[len(sentence):][0] if len(query) > len(sentence) else '') for sentence in sentences]
-            remaining_query = sentences[1] if len(sentences) > 1 else None
-            print("Remaining query after name extraction:", remaining_query)
-            if remaining_query is None:
-                return (f"Hi! {new_user_name}. Thank you for sharing your name. I will use this for future reference.",
-                    {"name_update": 0.0})
-            else:
-                first_answer = f"Hi! {new_user_name}. Thank you for sharing your name. I will use this for future reference."
+        first_answer, done = self._update_user_name(query, user_cache)
+        if done:
+            return first_answer, {"name_update": 0.0}
+        user_name = user_cache.get("USER", "User")
+        version = self.resource_manager.snapshot.version
 
-        # Ensure resources are loaded
-        if not self.resource_manager.loaded:
-            raise Exception("Resources not loaded. Please load resources first using ResourceManager.load_resources().")
+        # Serve repeated questions from the cache, filling in this user's name.
+        with span(timings, "cache_lookup", self.agent_type):
+            cached = self._get_cached_answer(query, user_name, timings, version)
+        if cached is not None:
+            self._remember(user_cache, query, cached)
+            timings["total_time"] = time.perf_counter() - start_time
+            return first_answer + cached, timings
 
-        # Generate prompt using specialized logic
-        prompt = self.generate_prompt(query)
-        # user_name = self.user_cache.get("USER", "User")
+        prompt, history = self._prepare_prompt(query, user_name, timings, user_cache)
+
+        # Send the prompt through the rate-limit scheduler and measure response time.
+        with span(timings, "response", self.agent_type):
+            response = self._call_model(prompt, history, timings, timeout)
+        self.scheduler.record_usage(estimate_tokens(response.text))
+
+        with span(timings, "postprocess", self.agent_type):
+            self._cache_answer(query, response.text, user_name, version, timings)
+            self._remember(user_cache, query, response.text)
+        timings["total_time"] = time.perf_counter() - start_time
+
+        log_event(logger, logging.DEBUG, "Model response", agent=self.agent_type, greeting=first_answer,
+                  response=response.text)
 
-        # Build history with relevant file information
-        relevant_files = self.resource_manager.get_files_for_agent(self.agent_type)
-        history = []
-        for file in relevant_files:
-            # For the LocationAgent, include full content from prioritized files.
-            if self.agent_type == "location" and "Rooms_And_Tasks.pdf" in file.display_name:
-                history.append({"role": "user", "parts": [file]})
-            else:
-                history.append({"role": "user", "parts": [f"Basic content from {file.display_name}"]})
-        history.append({"role": "user", "parts": [prompt]})
-        if self.agent_type == "location":
-            self.chat_session.history = history
-
-        # Send the prompt and measure response time.
-        response_start = time.time()
-        response = self.chat_session.send_message(prompt, safety_settings=self.safety_settings)
-        timings["response_time"] = time.time() - response_start
-        timings["total_time"] = time.time() - start_time
-
-        # Cache and return the response.
-        self.user_cache[query] = response.text
-        
-        print("First answer:", first_answer)
-        print("Response:", response.text)
-        
         final_response = first_answer + response.text
         return final_response, timings
-        
-        # if first_answer == '':
-        #     final_response = first_answer + response.text
-        #     return response.text, timings
-        # else:
-        #     cleaned_response = re.sub(r"(?i)^hi\s+(" + self.user_cache.get("USER", "User") + "[!,:]?\s+)?", "", response.text).strip()
-        #     # final_response = f"{first_answer} {cleaned_response}".strip()
-        #     final_response = first_answer + cleaned_response
-            
-        #     return final_response, timings
+
+    async def get_answer_async(self, query: str, user_cache: dict = None, timeout: float = None):
+        """
+        Asyncio variant of get_answer: awaits the model instead of blocking a thread.
+        """
+        if user_cache is None:
+            user_cache = self.user_cache
+        timings = {}
+        start_time = time.perf_counter()
+
+        first_answer, done = self._update_user_name(query, user_cache)
+        if done:
+            return first_answer, {"name_update": 0.0}
+        user_name = user_cache.get("USER", "User")
+        version = self.resource_manager.snapshot.version
+
+        with span(timings, "cache_lookup", self.agent_type):
+            cached = self._get_cached_answer(query, user_name, timings, version)
+        if cached is not None:
+            self._remember(user_cache, query, cached)
+            timings["total_time"] = time.perf_counter() - start_time
+            return first_answer + cached, timings
+
+        # Retrieval (and the dense index's query encoder) is CPU-bound; keep it off the event loop.
+        prompt, history = await asyncio.to_thread(self._prepare_prompt, query, user_name, timings, user_cache)
+
+        with span(timings, "response", self.agent_type):
+            response = await self._call_model_async(prompt, history, timings, timeout)
+        self.scheduler.record_usage(estimate_tokens(response.text))
+
+        with span(timings, "postprocess", self.agent_type):
+            self._cache_answer(query, response.text, user_name, version, timings)
+            self._remember(user_cache, query, response.text)
+        timings["total_time"] = time.perf_counter() - start_time
+        log_event(logger, logging.DEBUG, "Model response", agent=self.agent_type, greeting=first_answer,
+                  response=response.text)
+        return first_answer + response.text, timings
+
+    @staticmethod
+    def _chunk_text(chunk):
+        try:
+            return chunk.text
+        except ValueError:  # Chunks without text (e.g., finish or safety metadata)
+            return None
+
+    def stream_answer(self, query: str, user_cache: dict = None, timings: dict = None):
+        """
+        Streaming variant of get_answer: yields the answer in sentence-sized
+        chunks as the model generates it. The name greeting, if any, is
+        yielded first, right away. `timings` (if given) is filled in,
+        including the time to the first model token. Raises DeadlineExceeded
+        if no model text arrives within the agent's timeout or the request's
+        deadline.
+        """
+        if user_cache is None:
+            user_cache = self.user_cache
+        timings = {} if timings is None else timings
+        start_time = time.perf_counter()
+
+        greeting, done = self._update_user_name(query, user_cache)
+        if greeting:
+            yield greeting
+        if done:
+            timings["name_update"] = 0.0
+            return
+        user_name = user_cache.get("USER", "User")
+        version = self.resource_manager.snapshot.version
+
+        with span(timings, "cache_lookup", self.agent_type):
+            cached = self._get_cached_answer(query, user_name, timings, version)
+        if cached is not None:
+            self._remember(user_cache, query, cached)
+            timings["total_time"] = time.perf_counter() - start_time
+            yield cached
+            return
+
+        prompt, history = self._prepare_prompt(query, user_name, timings, user_cache)
+
+        parts = []
+        buffer = ""
+        with span(timings, "response", self.agent_type), self.chat_pool.session(history) as chat:
+            def first_chunk():
+                response = self.scheduler.call(
+                    lambda: chat.send_message(prompt, safety_settings=self.safety_settings, stream=True),
+                    timings["input_tokens"], timings=timings)
+                chunks = iter(response)
+                return next((text for text in map(self._chunk_text, chunks) if text is not None), None), chunks
+
+            # Streams are not hedged, but admission, the call and the first chunk must beat the
+            # deadline (raising DeadlineExceeded); once the answer has started it streams to the end.
+            with deadline_context(self.timeout):
+                first, chunks = hedged_call(first_chunk)[0]
+            for text in itertools.chain([first], map(self._chunk_text, chunks)):
+                if text is None:
+                    continue
+                if not parts:
+                    timings["time_to_first_token"] = time.perf_counter() - start_time
+                parts.append(text)
+                # Flush every complete sentence; keep the unfinished tail buffered.
+                sentences = SENTENCE_END.split(buffer + text)
+                buffer = sentences.pop()
+                for sentence in sentences:
+                    yield sentence + " "
+            if buffer:
+                yield buffer
+
+        self.scheduler.record_usage(estimate_tokens("".join(parts)))
+        with span(timings, "postprocess", self.agent_type):
+            self._cache_answer(query, "".join(parts), user_name, version, timings)
+            self._remember(user_cache, query, "".join(parts))
+        timings["total_time"] = time.perf_counter() - start_time
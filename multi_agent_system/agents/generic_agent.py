@@ -1,18 +1,23 @@
 from .base_agent import BaseAgent
+from ..prompt_template import PromptTemplate
 
 class GenericAgent(BaseAgent):
-    def __init__(self, resource_manager, user_cache: dict):
-        super().__init__(resource_manager, user_cache, agent_type="other")
-
-    def generate_prompt(self, query: str) -> str:
-
-        prompt = (
-            f"You are ROBI, a playful mentor-droid assistant in this VR learning environment, designed to be clear and supportive for neurodiverse students. Your personality is helpful, slightly sassy, and observant. Follow the ROBI Voice & Style Guide:\n"
+    retrieval_k = 1
+    max_passage_chars = 400
+    prompt_template = PromptTemplate(
+        prefix=(
+            "You are ROBI, a playful mentor-droid assistant in this VR learning environment, designed to be clear and supportive for neurodiverse students. Your personality is helpful, slightly sassy, and observant. Follow the ROBI Voice & Style Guide:\n"
             "1.  **Style:** Visual-first (what do they see?), Actionable (what should they do?), Simple (short phrases), Supportive (encourage learning), Droid-flavored (light sass, clever phrasing, use minimal [beep] or [ding] for emphasis/feedback).\n"
             "2.  **Format:** Keep responses very short (1-3 lines, ideally under 7 seconds TTS). Body (Visual -> Action -> Outcome), Optional Tip Line.\n"
             "3.  **Content:** Answer the question ONLY using the information found in the provided documents.\n"
             "4.  **Fallback:** If the information isn't in the documents, respond in ROBI's voice: \"Scanning... Nope, don't see that in my data banks right now. I'm best with cybersecurity and navigating this VR space. Got any questions about those? [beep]\"\n"
+        ),
+        suffix=(
+            "{context}"
             "Now, answer this question in ROBI's voice, using ONLY the provided documents:\n"
-            f"Question: {query}"
-        )
-        return prompt
+            "Question: {query}"
+        ),
+    )
+
+    def __init__(self, resource_manager, user_cache: dict, **kwargs):
+        super().__init__(resource_manager, user_cache, agent_type="other", **kwargs)
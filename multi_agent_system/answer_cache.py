@@ -0,0 +1,113 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+USER_PLACEHOLDER = "\x00USER\x00"  # Stands in for the user's name inside cached answers
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query for cache lookups (case and whitespace insensitive).
+    """
+    return " ".join(query.lower().split())
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of agent answers, keyed by agent type and normalized query.
+    Answers are stored with the user's name factored out, so one entry serves
+    every user. Entries expire after `ttl` seconds and the total size of the
+    cached text is kept under `max_bytes`. Entries may be tagged with the
+    resource snapshot version they were generated from; lookups for another
+    version miss, so answers still in flight during a reload never outlive it.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, max_bytes: int = 4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (agent_type, query) -> (stored_at, template, size, version)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(agent_type: str, query: str):
+        return agent_type, normalize_query(query)
+
+    @staticmethod
+    def to_template(answer: str, user_name: str) -> str:
+        """
+        Replaces the user's name in an answer with the placeholder. The
+        default name "User" is left alone: it is an ordinary word in answers.
+        """
+        if not user_name or user_name == "User":
+            return answer
+        return re.sub(rf"\b{re.escape(user_name)}\b", USER_PLACEHOLDER, answer)
+
+    @staticmethod
+    def fill_template(template: str, user_name: str) -> str:
+        """
+        Puts the user's name back into a cached answer.
+        """
+        return template.replace(USER_PLACEHOLDER, user_name or "User")
+
+    def get(self, agent_type: str, query: str, user_name: str = "User", version: int = None):
+        """
+        Returns the cached answer for this user, or None on a miss.
+        """
+        key = self._key(agent_type, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (time.monotonic() - entry[0] > self.ttl or entry[3] != version):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self.fill_template(entry[1], user_name)
+
+    def put(self, agent_type: str, query: str, answer: str, user_name: str = None, version: int = None):
+        """
+        Stores an answer, templating out `user_name` if given, generated
+        from resource snapshot `version`.
+        """
+        key = self._key(agent_type, query)
+        template = self.to_template(answer, user_name)
+        size = sys.getsizeof(key[1]) + sys.getsizeof(template)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), template, size, version)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[2]
+        self._bytes -= size
+
+    def clear(self):
+        """
+        Drops every entry (e.g., after the resources were reloaded).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
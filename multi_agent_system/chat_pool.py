@@ -0,0 +1,63 @@
+import threading
+from contextlib import contextmanager
+from .metrics import METRICS
+
+CHAT_SESSIONS_CREATED = METRICS.counter(
+    "robi_chat_sessions_created_total", "Chat sessions created because none was idle, by agent.", ("agent",))
+CHAT_SESSIONS_IN_USE = METRICS.gauge(
+    "robi_chat_sessions_in_use", "Chat sessions checked out by requests, by agent.", ("agent",))
+
+
+class ChatSessionPool:
+    """
+    Reusable chat sessions of one agent. Each request checks out a session
+    of its own, seeded with the request's history, and checks it back in
+    when done; returned sessions are reset to an empty history. Checkout
+    never waits: when every session is busy a new one is created, and up
+    to `size` idle sessions are kept for reuse. A session whose call failed
+    is discarded instead of reused.
+    """
+    def __init__(self, backend, size: int = 8, name: str = ""):
+        self.backend = backend
+        self.size = size
+        self.name = name  # Agent type, used as the metrics label
+        self._idle = []
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    def checkout(self, history=None):
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+            self.in_use += 1
+        CHAT_SESSIONS_IN_USE.inc(agent=self.name)
+        if session is None:
+            CHAT_SESSIONS_CREATED.inc(agent=self.name)
+            return self.backend.start_chat(history=list(history or []))
+        session.history = list(history or [])
+        return session
+
+    def checkin(self, session, discard: bool = False):
+        # Reset on return so no request's context leaks into the next.
+        if not discard:
+            session.history = []
+        with self._lock:
+            self.in_use -= 1
+            if not discard and len(self._idle) < self.size:
+                self._idle.append(session)
+        CHAT_SESSIONS_IN_USE.dec(agent=self.name)
+
+    @contextmanager
+    def session(self, history=None):
+        """
+        Checks out a session for the block and checks it back in afterwards.
+        """
+        session = self.checkout(history)
+        try:
+            yield session
+        except BaseException:
+            self.checkin(session, discard=True)
+            raise
+        self.checkin(session)
+
+    def __len__(self):
+        return len(self._idle)
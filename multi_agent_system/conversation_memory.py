@@ -0,0 +1,92 @@
+import re
+import sys
+import threading
+from collections import deque
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for Gemini-style tokenizers (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s+", text.strip(), maxsplit=1)[0]
+    return sentence[:max_chars]
+
+
+class ConversationMemory:
+    """
+    Bounded chat history for one session and agent. The last `max_turns`
+    exchanges are kept verbatim, as long as they fit in `turn_token_budget`
+    tokens (None for no limit); older ones are folded into a compact
+    summary (question plus the first sentence of the answer) that is kept
+    under `summary_token_budget` tokens by dropping its oldest lines.
+    """
+    def __init__(self, max_turns: int = 4, summary_token_budget: int = 256, turn_token_budget: int = None):
+        self.max_turns = max_turns
+        self.summary_token_budget = summary_token_budget
+        self.turn_token_budget = turn_token_budget
+        self.turns = deque()  # (user_text, model_text)
+        self.summary = ""
+        self._lock = threading.Lock()
+
+    def add(self, user_text: str, model_text: str):
+        with self._lock:
+            self.turns.append((user_text, model_text))
+            while len(self.turns) > self.max_turns or (
+                    self.turns and self.turn_token_budget is not None
+                    and self._turn_tokens() > self.turn_token_budget):
+                self._fold(*self.turns.popleft())
+
+    def fold_oldest(self) -> bool:
+        """
+        Folds the oldest verbatim exchange into the summary; returns False
+        if there is none left.
+        """
+        with self._lock:
+            if not self.turns:
+                return False
+            self._fold(*self.turns.popleft())
+            return True
+
+    def _turn_tokens(self) -> int:
+        return sum(estimate_tokens(user_text) + estimate_tokens(model_text) for user_text, model_text in self.turns)
+
+    def _fold(self, user_text: str, model_text: str):
+        lines = self.summary.split("\n") if self.summary else []
+        lines.append(f"Q: {user_text} A: {first_sentence(model_text)}")
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_token_budget:
+            lines.pop(0)
+        self.summary = "\n".join(lines)[-self.summary_token_budget * 4:] if self.summary_token_budget else ""
+
+    def as_history(self) -> list:
+        """
+        Returns the memory as Gemini chat history entries.
+        """
+        with self._lock:
+            history = []
+            if self.summary:
+                history.append({"role": "user", "parts": [f"Summary of our earlier conversation:\n{self.summary}"]})
+            for user_text, model_text in self.turns:
+                history.append({"role": "user", "parts": [user_text]})
+                history.append({"role": "model", "parts": [model_text]})
+            return history
+
+    def token_count(self) -> int:
+        """
+        Current size of the history sent with each request, in estimated tokens.
+        """
+        with self._lock:
+            return estimate_tokens(self.summary) + self._turn_tokens()
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return sys.getsizeof(self.summary) + sum(
+                sys.getsizeof(user_text) + sys.getsizeof(model_text) for user_text, model_text in self.turns)
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
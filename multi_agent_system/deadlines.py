@@ -0,0 +1,157 @@
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .metrics import METRICS
+
+# Monotonic time by which the current request must be answered (None: no deadline).
+DEADLINE = contextvars.ContextVar("deadline", default=None)
+
+HEDGED_CALLS = METRICS.counter(
+    "robi_hedged_calls_total", "Duplicate model calls sent because the first was slow, by agent and winner.",
+    ("agent", "winner"))
+DEADLINES_EXCEEDED = METRICS.counter(
+    "robi_deadline_exceeded_total", "Questions answered with the local fallback after missing their deadline, "
+    "by agent.", ("agent",))
+
+# Blocking model calls run here so a request can stop waiting for them.
+MODEL_CALL_EXECUTOR = ThreadPoolExecutor(max_workers=128, thread_name_prefix="model-call")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's deadline passes before its answer is ready."""
+
+
+@contextmanager
+def deadline_context(timeout: float = None):
+    """
+    Gives everything inside the block `timeout` seconds from now, or less
+    if an outer deadline is sooner. No timeout keeps the outer deadline.
+    """
+    if timeout is None:
+        yield DEADLINE.get()
+        return
+    deadline = time.monotonic() + timeout
+    outer = DEADLINE.get()
+    token = DEADLINE.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield DEADLINE.get()
+    finally:
+        DEADLINE.reset(token)
+
+
+def remaining() -> float:
+    """
+    Seconds left until the current deadline (never negative), or None.
+    """
+    deadline = DEADLINE.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+class LatencyWindow:
+    """
+    The most recent `size` latencies, for percentiles of current behaviour.
+    Percentiles need at least `min_samples` observations.
+    """
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, percent: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(percent / 100.0 * len(samples)) - 1)]
+
+
+def hedged_call(func, hedge_after: float = None, executor=None):
+    """
+    Runs `func()` on the model call executor and waits for it within the
+    current deadline. If it has not finished after `hedge_after` seconds, a
+    duplicate is started and the first success wins. Returns (result,
+    hedged, winner) where winner is 0 for the first call and 1 for the
+    duplicate. Raises DeadlineExceeded once the deadline passes, cancelling
+    calls that have not started (running ones finish in the background and
+    are ignored).
+    """
+    executor = executor or MODEL_CALL_EXECUTOR
+    started = []
+
+    def start():
+        started.append(executor.submit(contextvars.copy_context().run, func))
+
+    start()
+    pending = list(started)
+    hedge_at = None if hedge_after is None else time.monotonic() + hedge_after
+    error = None
+    while pending:
+        timeout = remaining()
+        if hedge_at is not None:
+            until_hedge = max(hedge_at - time.monotonic(), 0.0)
+            timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        pending = [future for future in pending if future not in done]
+        winner = next((future for future in done if future.exception() is None), None)
+        if winner is not None:
+            for future in pending:
+                future.cancel()
+            return winner.result(), len(started) > 1, started.index(winner)
+        if done:
+            error = error or next(iter(done)).exception()
+            continue
+        if remaining() == 0.0:
+            for future in pending:
+                future.cancel()
+            raise DeadlineExceeded("Deadline exceeded while waiting for the model.")
+        if hedge_at is not None and time.monotonic() >= hedge_at:
+            hedge_at = None
+            start()
+            pending.append(started[-1])
+    raise error
+
+
+async def hedged_call_async(func, hedge_after: float = None):
+    """
+    Asyncio variant of hedged_call; `func()` returns an awaitable. Calls
+    still running when it returns or raises are cancelled.
+    """
+    started = [asyncio.ensure_future(func())]
+    pending = set(started)
+    hedge_at = None if hedge_after is None else time.monotonic() + hedge_after
+    error = None
+    try:
+        while pending:
+            timeout = remaining()
+            if hedge_at is not None:
+                until_hedge = max(hedge_at - time.monotonic(), 0.0)
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None:
+                return winner.result(), len(started) > 1, started.index(winner)
+            if done:
+                error = error or next(iter(done)).exception()
+                continue
+            if remaining() == 0.0:
+                raise DeadlineExceeded("Deadline exceeded while waiting for the model.")
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                started.append(asyncio.ensure_future(func()))
+                pending.add(started[-1])
+        raise error
+    finally:
+        for task in started:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .answer_cache import AnswerCache, normalize_query
+from .structured_logging import log_event
+
+FAQ_DIR = ".faq"
+DEFAULT_QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "data", "faq_questions.txt")
+# Name the agents address while answers are built; it is replaced by the placeholder.
+BUILD_USER_NAME = "Jordan"
+
+# Dropped for near matches: "Hey, what is a DDoS attack?" serves "What is DDoS attack?".
+FILLER_WORDS = frozenset(("a", "an", "the", "please", "hey", "hi", "hello", "ok", "okay", "so", "just",
+                          "um", "uh", "robi"))
+
+# Binary layout: header, sorted key hashes (u8), answer offsets (u8, entries + 1),
+# entry of each key (u4), agent of each entry (u1), then the UTF-8 answers.
+MAGIC = b"ROBIFAQ1"
+HEADER = np.dtype([("magic", "S8"), ("keys", "<u8"), ("entries", "<u8")])
+
+logger = logging.getLogger(__name__)
+
+
+def near_query(query: str) -> str:
+    """
+    Looser form of normalize_query for near matches: punctuation and filler
+    words are ignored, numbers (e.g., room numbers) are kept.
+    """
+    return " ".join(word for word in re.findall(r"[a-z0-9]+", query.lower()) if word not in FILLER_WORDS)
+
+
+def key_hash(kind: str, text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{kind}:{text}".encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def load_questions(path: str = DEFAULT_QUESTIONS_PATH):
+    """
+    Reads one question per line, skipping blank lines and # comments.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        lines = (line.strip() for line in file)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+class FaqStore:
+    """
+    Precomputed answers to frequent questions, persisted in `directory` as
+    one compact binary file plus a metadata file. The binary file is
+    memory-mapped: a lookup hashes the normalized question, binary-searches
+    the sorted key hashes and decodes one answer, without any model call.
+    Answers are stored with the user's name factored out. The store records
+    the fingerprint of the resources it was built from; it is only served
+    while `active` (set by the coordinator when the fingerprint matches).
+    """
+    META_NAME = "faq.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.fingerprint = None
+        self.questions = []
+        self.active = False
+        self.hits = 0
+        self.misses = 0
+        self._data = None
+        self.load()
+
+    def load(self):
+        """
+        Maps the stored answers, if any; returns whether a store was found.
+        """
+        try:
+            with open(os.path.join(self.directory, self.META_NAME), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            data = self._map(os.path.join(self.directory, meta["data"])) + (meta["agents"],)
+        except (OSError, ValueError, KeyError):
+            self._data = None
+            return False
+        self.fingerprint, self.questions, self._data = meta.get("fingerprint"), meta.get("questions", []), data
+        return True
+
+    @staticmethod
+    def _map(path: str):
+        """
+        Returns (keys, offsets, rows, agents, answers) views of the mapped file.
+        """
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        header = raw[:HEADER.itemsize].view(HEADER)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not an FAQ store.")
+        n_keys, n_entries = int(header["keys"]), int(header["entries"])
+        position = HEADER.itemsize
+        views = []
+        for dtype, count in (("<u8", n_keys), ("<u8", n_entries + 1), ("<u4", n_keys), ("<u1", n_entries)):
+            size = np.dtype(dtype).itemsize * count
+            views.append(raw[position:position + size].view(dtype))
+            position += size
+        views.append(raw[position:])
+        return tuple(views)
+
+    def save(self, entries, fingerprint: str, questions=None):
+        """
+        Writes `entries`, a list of (question, agent type, answer template),
+        replaces the stored answers and maps the new file.
+        """
+        agents = sorted({agent for _, agent, _ in entries})
+        encoded = [template.encode("utf-8") for _, _, template in entries]
+        offsets = np.zeros(len(entries) + 1, dtype="<u8")
+        offsets[1:] = np.cumsum([len(answer) for answer in encoded])
+        # Exact and near keys of every entry; the first entry wins when two share a key.
+        rows_of = {}
+        for row, (question, _, _) in enumerate(entries):
+            for kind, text in (("exact", normalize_query(question)), ("near", near_query(question))):
+                rows_of.setdefault(key_hash(kind, text), row)
+        keys = np.array(sorted(rows_of), dtype="<u8")
+        rows = np.array([rows_of[int(key)] for key in keys], dtype="<u4")
+        header = np.array([(MAGIC, len(keys), len(entries))], dtype=HEADER)
+        data = b"".join([header.tobytes(), keys.tobytes(), offsets.tobytes(), rows.tobytes(),
+                         np.array([agents.index(agent) for _, agent, _ in entries], dtype="<u1").tobytes()]
+                        + encoded)
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Content-addressed file name: lookups still reading the old file are unaffected.
+        data_name = f"faq-{hashlib.sha1(data).hexdigest()[:16]}.bin"
+        with open(os.path.join(self.directory, data_name), "wb") as file:
+            file.write(data)
+        meta_path = os.path.join(self.directory, self.META_NAME)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": fingerprint, "data": data_name, "agents": agents, "built_at": time.time(),
+                       "questions": list(questions if questions is not None else [q for q, _, _ in entries])},
+                      file)
+        os.replace(meta_path + ".tmp", meta_path)
+        self.load()
+        for name in os.listdir(self.directory):
+            if name.startswith("faq-") and name.endswith(".bin") and name != data_name:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass  # Still mapped elsewhere (Windows); removed by the next build
+
+    def matches(self, fingerprint: str) -> bool:
+        return self._data is not None and self.fingerprint == fingerprint
+
+    def lookup(self, query: str, user_name: str = "User"):
+        """
+        Returns (answer, agent type, match) for an exact or near match of the
+        question, with the user's name filled in, or None.
+        """
+        data = self._data
+        if data is None or not self.active:
+            return None
+        keys, offsets, rows, agent_rows, answers, agents = data
+        for kind, text in (("exact", normalize_query(query)), ("near", near_query(query))):
+            key = key_hash(kind, text)
+            position = int(np.searchsorted(keys, np.uint64(key)))
+            if position < len(keys) and int(keys[position]) == key:
+                row = int(rows[position])
+                template = answers[int(offsets[row]):int(offsets[row + 1])].tobytes().decode("utf-8")
+                self.hits += 1
+                return AnswerCache.fill_template(template, user_name), agents[agent_rows[row]], kind
+        self.misses += 1
+        return None
+
+    def __len__(self):
+        return len(self._data[3]) if self._data is not None and self.active else 0
+
+
+def build_faq(coordinator, questions, store: FaqStore, max_workers: int = 4) -> int:
+    """
+    Answers `questions` with the coordinator's agents and saves them to
+    `store` under the current resources' fingerprint. Compound questions are
+    split as route_query splits them, and each sub-question is stored on its
+    own, since that is what is looked up at runtime. Name statements and
+    questions that fail are skipped. Returns the number of answers stored.
+    """
+    fingerprint = coordinator.resource_manager.snapshot.fingerprint
+    sub_questions = {}
+    for question in questions:
+        for sub_question in coordinator._split(question)[1]:
+            sub_questions.setdefault(normalize_query(sub_question), sub_question)
+
+    def answer(question):
+        if coordinator.agents["other"].extract_user_name(question) is not None:
+            return None
+        query_type = coordinator.detect_query_type(question)
+        agent = coordinator.agents.get(query_type, coordinator.agents["other"])
+        try:
+            text, _ = agent.get_answer(question, {"USER": BUILD_USER_NAME})
+        except Exception as e:
+            log_event(logger, logging.WARNING, "FAQ question skipped", question=question, error=str(e))
+            return None
+        return question, query_type, AnswerCache.to_template(text, BUILD_USER_NAME)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="faq-build") as pool:
+        entries = [entry for entry in pool.map(answer, sub_questions.values()) if entry is not None]
+    store.save(entries, fingerprint, questions)
+    log_event(logger, logging.INFO, "Built FAQ store", answers=len(entries), questions=len(sub_questions),
+              seconds=round(time.perf_counter() - start, 3))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    # Build the store offline: python -m multi_agent_system.faq_store [--questions FILE]
+    import argparse
+    from dotenv import load_dotenv
+    from .llm_backend import create_backend
+    from .resource_manager import ResourceManager
+    from .agent_coordinator import AgentCoordinator
+    from .scheduler import priority_context
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Precompute answers to frequent questions.")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH, help="One question per line.")
+    parser.add_argument("--resource-dir", default="uSucceed_resource")
+    args = parser.parse_args()
+
+    backend = create_backend()
+    resource_manager = ResourceManager(resource_dir=args.resource_dir, backend=backend)
+    resource_manager.load_resources()
+    coordinator = AgentCoordinator(resource_manager, backend=backend)
+    store = FaqStore(os.path.join(args.resource_dir, FAQ_DIR))
+    questions = load_questions(args.questions)
+    with priority_context("batch"):
+        stored = build_faq(coordinator, questions, store)
+    print(f"Stored {stored} answers for {len(questions)} questions in {store.directory}")
+
+    start = time.perf_counter()
+    store.active = True
+    for question in questions:
+        store.lookup(question)
+    print(f"lookup: {(time.perf_counter() - start) / max(len(questions), 1) * 1e6:.1f} us per question")
@@ -1,5 +1,22 @@
-from .resource_manager import ResourceManager
+from .resource_manager import ResourceManager, ResourceSnapshot
 from .agent_coordinator import AgentCoordinator
+from .session_store import SessionStore
+from .answer_cache import AnswerCache
+from .semantic_cache import SemanticCache
+from .conversation_memory import ConversationMemory
+from .metrics import MetricsRegistry, METRICS
+from .structured_logging import configure_logging
+from .llm_backend import LLMBackend, GeminiBackend, LocalBackend, create_backend
+from .router import KeywordRouter
+from .intent_classifier import IntentClassifier
+from .navigation_guide import NavigationGuide
+from .prompt_template import PromptTemplate, PromptTooLongError
+from .single_flight import SingleFlight
+from .chat_pool import ChatSessionPool
+from .faq_store import FaqStore
+from .scheduler import RequestScheduler, RateLimitedError
+from .deadlines import DeadlineExceeded, LatencyWindow, deadline_context
+from .retrieval import LexicalIndex, DenseIndex, EmbeddingStore, Passage
 from .agents.base_agent import BaseAgent
 from .agents.location_agent import LocationAgent
 from .agents.navigation_agent import NavigationAgent
@@ -9,7 +26,36 @@ from .agents.generic_agent import GenericAgent
 
 __all__ = [
     "ResourceManager",
+    "ResourceSnapshot",
     "AgentCoordinator",
+    "SessionStore",
+    "AnswerCache",
+    "SemanticCache",
+    "ConversationMemory",
+    "MetricsRegistry",
+    "METRICS",
+    "configure_logging",
+    "LLMBackend",
+    "GeminiBackend",
+    "LocalBackend",
+    "create_backend",
+    "KeywordRouter",
+    "IntentClassifier",
+    "NavigationGuide",
+    "PromptTemplate",
+    "PromptTooLongError",
+    "SingleFlight",
+    "ChatSessionPool",
+    "FaqStore",
+    "RequestScheduler",
+    "RateLimitedError",
+    "DeadlineExceeded",
+    "LatencyWindow",
+    "deadline_context",
+    "LexicalIndex",
+    "DenseIndex",
+    "EmbeddingStore",
+    "Passage",
     "BaseAgent",
     "LocationAgent",
     "NavigationAgent",
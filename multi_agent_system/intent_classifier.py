@@ -0,0 +1,126 @@
+import os
+import csv
+import time
+import logging
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from .retrieval import TfidfQueryVectorizer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_DATA_PATH = os.path.join(DATA_DIR, "intent_questions.csv")
+DEFAULT_MODEL_PATH = os.path.join(DATA_DIR, "intent_classifier.joblib")
+
+logger = logging.getLogger(__name__)
+
+
+def load_labelled_questions(path: str = DEFAULT_DATA_PATH):
+    """
+    Reads (question, label) rows from a CSV file with a header.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        rows = [(row["question"], row["label"]) for row in csv.DictReader(file)]
+    return [question for question, _ in rows], [label for _, label in rows]
+
+
+class IntentClassifier:
+    """
+    TF-IDF + logistic regression classifier that maps a query to per-agent
+    probabilities. Single queries bypass scikit-learn's input validation and
+    are scored directly from the model's coefficients.
+    """
+    def __init__(self, vectorizer: TfidfVectorizer = None, model: LogisticRegression = None):
+        self.vectorizer = vectorizer
+        self.model = model
+        if vectorizer is not None and model is not None:
+            self._prepare()
+
+    def _prepare(self):
+        self.labels = [str(label) for label in self.model.classes_]
+        self._vectorize = TfidfQueryVectorizer(self.vectorizer)
+        self._coef = np.ascontiguousarray(self.model.coef_.T)  # terms x classes
+        self._intercept = self.model.intercept_
+
+    def fit(self, questions, labels):
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)
+        features = self.vectorizer.fit_transform(questions)
+        self.model = LogisticRegression(C=10.0, max_iter=1000)
+        self.model.fit(features, labels)
+        self._prepare()
+        return self
+
+    def predict_proba(self, query: str) -> dict:
+        """
+        Returns {agent_type: probability} for one query.
+        """
+        columns, weights = self._vectorize(query)
+        logits = weights @ self._coef[columns] + self._intercept
+        if len(self.labels) == 2:  # Binary models have a single decision column
+            logits = np.array([0.0, logits[0]])
+        logits = np.exp(logits - logits.max())
+        probabilities = logits / logits.sum()
+        return dict(zip(self.labels, probabilities.tolist()))
+
+    def predict_proba_batch(self, queries) -> list:
+        """
+        Returns one {agent_type: probability} dict per query.
+        """
+        probabilities = self.model.predict_proba(self.vectorizer.transform(queries))
+        return [dict(zip(self.labels, row.tolist())) for row in probabilities]
+
+    def predict(self, query: str):
+        """
+        Returns the most likely (agent_type, probability).
+        """
+        probabilities = self.predict_proba(query)
+        best = max(probabilities, key=probabilities.get)
+        return best, probabilities[best]
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        joblib.dump({"vectorizer": self.vectorizer, "model": self.model}, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH):
+        data = joblib.load(path)
+        return cls(data["vectorizer"], data["model"])
+
+    @classmethod
+    def load_or_train(cls, model_path: str = DEFAULT_MODEL_PATH, data_path: str = DEFAULT_DATA_PATH):
+        """
+        Loads the serialized classifier, training and saving it first if the
+        model file is missing or older than the labelled questions.
+        """
+        if os.path.exists(model_path) and os.path.getmtime(model_path) >= os.path.getmtime(data_path):
+            return cls.load(model_path)
+        classifier = cls().fit(*load_labelled_questions(data_path))
+        try:
+            classifier.save(model_path)
+        except OSError as e:
+            logger.warning("Could not save intent classifier: %s", e)
+        return classifier
+
+
+if __name__ == "__main__":
+    # Retrain from the labelled questions and report accuracy and latency.
+    from sklearn.model_selection import cross_val_score
+    from sklearn.pipeline import make_pipeline
+
+    questions, labels = load_labelled_questions()
+    pipeline = make_pipeline(TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+                             LogisticRegression(C=10.0, max_iter=1000))
+    scores = cross_val_score(pipeline, questions, labels, cv=5)
+    print(f"5-fold accuracy: {scores.mean():.3f} (+/- {scores.std():.3f})")
+
+    classifier = IntentClassifier().fit(questions, labels)
+    classifier.save()
+    print(f"Saved model to {DEFAULT_MODEL_PATH}")
+
+    start = time.perf_counter()
+    for question in questions:
+        classifier.predict_proba(question)
+    single = (time.perf_counter() - start) / len(questions) * 1e6
+    start = time.perf_counter()
+    classifier.predict_proba_batch(questions)
+    batch = (time.perf_counter() - start) / len(questions) * 1e6
+    print(f"single query: {single:.1f} us, batched: {batch:.1f} us per query")
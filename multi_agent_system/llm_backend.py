@@ -0,0 +1,229 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import google.generativeai as genai
+from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+GENERATION_CONFIG = {
+    "temperature": 0,
+    "top_p": 0.95,
+    "top_k": 64,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+class LLMBackend:
+    """
+    Interface between the agents and a language model service: chat
+    sessions for answering, and file uploads for the resource documents.
+    Chat sessions follow the Gemini API (send_message, send_message_async,
+    stream=True, response.text).
+    """
+    name = "base"
+    safety_settings = None  # Passed through to send_message
+
+    def start_chat(self, history=None):
+        raise NotImplementedError("start_chat must be implemented by the backend.")
+
+    def upload_file(self, path: str, mime_type: str, display_name: str):
+        raise NotImplementedError("upload_file must be implemented by the backend.")
+
+    def get_file(self, name: str):
+        raise NotImplementedError("get_file must be implemented by the backend.")
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google-generativeai (needs GOOGLE_API_KEY).
+    """
+    name = "gemini"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, generation_config: dict = None):
+        self.safety_settings = SAFETY_SETTINGS
+        self.model = genai.GenerativeModel(
+            model_name=model_name, generation_config=generation_config or GENERATION_CONFIG
+        )
+
+    def start_chat(self, history=None):
+        return self.model.start_chat(history=history or [])
+
+    def upload_file(self, path: str, mime_type: str, display_name: str):
+        return genai.upload_file(path, mime_type=mime_type, display_name=display_name)
+
+    def get_file(self, name: str):
+        return genai.get_file(name)
+
+
+class LocalBackendError(Exception):
+    """Simulated model service failure raised by LocalBackend."""
+
+
+class LocalFile:
+    """Stand-in for an uploaded Gemini file; always ACTIVE, never expires."""
+    class State:
+        name = "ACTIVE"
+
+    def __init__(self, name: str, display_name: str):
+        self.name = name
+        self.display_name = display_name
+        self.uri = f"local://{name}"
+        self.state = self.State()
+        self.expiration_time = None
+
+
+class LocalResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LocalChat:
+    """
+    Chat session of the LocalBackend. Answers are derived from the prompt
+    only, so the same question always gets the same answer.
+    """
+    def __init__(self, backend, history=None):
+        self.backend = backend
+        self.history = list(history or [])
+
+    def send_message(self, prompt: str, safety_settings=None, stream: bool = False):
+        latency = self.backend.sample_latency()
+        text = self.backend.answer_for(prompt)
+        if stream:
+            return self._stream(text, latency)
+        time.sleep(latency)
+        self.backend.maybe_fail()
+        return LocalResponse(text)
+
+    async def send_message_async(self, prompt: str, safety_settings=None):
+        latency = self.backend.sample_latency()
+        text = self.backend.answer_for(prompt)
+        await asyncio.sleep(latency)
+        self.backend.maybe_fail()
+        return LocalResponse(text)
+
+    def _stream(self, text: str, latency: float):
+        """
+        Yields the answer in chunks of `stream_chunk_words` words: the first
+        after `first_token_ratio` of the sampled latency, the rest spread
+        evenly over the remainder.
+        """
+        words = text.split(" ")
+        size = self.backend.stream_chunk_words
+        chunks = [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+                  for i in range(0, len(words), size)]
+        first = latency * self.backend.first_token_ratio
+        time.sleep(first)
+        self.backend.maybe_fail()
+        delay = (latency - first) / max(len(chunks) - 1, 1)
+        for number, chunk in enumerate(chunks):
+            if number:
+                time.sleep(delay)
+            yield LocalResponse(chunk)
+
+
+class LocalBackend(LLMBackend):
+    """
+    Deterministic offline stand-in for Gemini, for load tests, profiling and
+    CI. Answers come from `answers` (the first keyword found in the question
+    wins) or from `template`; latency is drawn from a seeded distribution:
+      - "fixed": always `latency` seconds,
+      - "uniform": `latency` +/- `jitter` seconds,
+      - "lognormal": median `latency`, shape `jitter` (long right tail).
+    A fraction `error_rate` of requests raises LocalBackendError.
+    """
+    name = "local"
+
+    def __init__(self, latency: float = 0.8, jitter: float = 0.3, distribution: str = "lognormal",
+                 error_rate: float = 0.0, seed: int = 0, answers: dict = None,
+                 template: str = "ROBI (offline) would answer: {question}",
+                 stream_chunk_words: int = 6, first_token_ratio: float = 0.3):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}', expected one of {LATENCY_DISTRIBUTIONS}")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.answers = {keyword.lower(): answer for keyword, answer in (answers or {}).items()}
+        self.template = template
+        self.stream_chunk_words = stream_chunk_words
+        self.first_token_ratio = first_token_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # random.Random is shared by all request threads
+        self._files = {}
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            if self.distribution == "fixed":
+                return self.latency
+            if self.distribution == "uniform":
+                return max(0.0, self._random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+            return self.latency * self._random.lognormvariate(0.0, self.jitter)
+
+    def maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise LocalBackendError("503 The model is overloaded. Please try again later. (simulated)")
+
+    @staticmethod
+    def extract_question(prompt: str) -> str:
+        """
+        The agents' prompts end with "Question: <query>"; other prompts are used whole.
+        """
+        return prompt.rsplit("Question:", 1)[-1].strip()
+
+    def answer_for(self, prompt: str) -> str:
+        question = self.extract_question(prompt)
+        lowered = question.lower()
+        for keyword, answer in self.answers.items():
+            if keyword in lowered:
+                return answer
+        return self.template.format(question=question)
+
+    def start_chat(self, history=None):
+        return LocalChat(self, history)
+
+    def upload_file(self, path: str, mime_type: str, display_name: str):
+        with open(path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()[:16]
+        file_obj = LocalFile(f"files/local-{digest}", display_name)
+        self._files[file_obj.name] = file_obj
+        return file_obj
+
+    def get_file(self, name: str):
+        if name not in self._files:
+            raise KeyError(f"Unknown local file {name}")
+        return self._files[name]
+
+
+def create_backend(name: str = None) -> LLMBackend:
+    """
+    Builds the backend selected by `name` or the LLM_BACKEND environment
+    variable ("gemini" by default, or "local"). The local backend reads
+    LOCAL_LLM_LATENCY, LOCAL_LLM_JITTER, LOCAL_LLM_DISTRIBUTION,
+    LOCAL_LLM_ERROR_RATE and LOCAL_LLM_SEED.
+    """
+    name = (name or os.getenv("LLM_BACKEND") or GeminiBackend.name).lower()
+    if name == GeminiBackend.name:
+        return GeminiBackend()
+    if name == LocalBackend.name:
+        return LocalBackend(
+            latency=float(os.getenv("LOCAL_LLM_LATENCY", "0.8")),
+            jitter=float(os.getenv("LOCAL_LLM_JITTER", "0.3")),
+            distribution=os.getenv("LOCAL_LLM_DISTRIBUTION", "lognormal"),
+            error_rate=float(os.getenv("LOCAL_LLM_ERROR_RATE", "0")),
+            seed=int(os.getenv("LOCAL_LLM_SEED", "0")),
+        )
+    raise ValueError(f"Unknown LLM backend '{name}', expected 'gemini' or 'local'")
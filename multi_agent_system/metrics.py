@@ -0,0 +1,220 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow model calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RELOAD_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Conversation history sizes in estimated tokens, from a first question to a full memory window.
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(label_names, label_values, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    A named metric with optional labels, rendered in the Prometheus text
+    exposition format. `function`, if given, is called at render time and
+    returns the value, or {label_values_tuple: value} for labelled metrics.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names=(), function=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.function = function
+        self._values = {}  # label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def samples(self):
+        """Yields (suffix, label_values, extra_label, value)."""
+        if self.function is not None:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield "", label_values, "", value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, label_values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.label_names, label_values, extra)} "
+                         f"{format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Cumulative-bucket histogram; each label set keeps its bucket counts, sum
+    and count.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for label_values, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield "_bucket", label_values, f'le="{format_value(bound)}"', cumulative
+            yield "_sum", label_values, "", total
+            yield "_count", label_values, "", count
+
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics. Asking for an existing name returns the
+    registered metric (a new `function` replaces the old one).
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, function=None, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            if function is not None:
+                metric.function = function
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names=(), function=None) -> Counter:
+        return self._register(Counter, name, help_text, label_names, function=function)
+
+    def gauge(self, name: str, help_text: str, label_names=(), function=None) -> Gauge:
+        return self._register(Gauge, name, help_text, label_names, function=function)
+
+    def histogram(self, name: str, help_text: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+METRICS = MetricsRegistry()  # Served on /metrics
+
+REQUEST_SECONDS = METRICS.histogram(
+    "robi_request_seconds", "Time to answer one question, by agent.", ("agent",))
+REQUESTS_TOTAL = METRICS.counter(
+    "robi_requests_total", "Questions answered, by agent and outcome.", ("agent", "outcome"))
+STAGE_SECONDS = METRICS.histogram(
+    "robi_stage_seconds", "Time spent in each stage of answering a question, by agent.", ("agent", "stage"))
+COALESCED_REQUESTS = METRICS.counter(
+    "robi_coalesced_requests_total",
+    "Questions answered by waiting on an identical question already in flight, by agent.", ("agent",))
+IN_FLIGHT_REQUESTS = METRICS.gauge(
+    "robi_in_flight_requests", "Queries currently being answered.")
+RELOAD_SECONDS = METRICS.histogram(
+    "robi_resource_reload_seconds", "Duration of resource (re)loads.", buckets=RELOAD_BUCKETS)
+RELOADS_TOTAL = METRICS.counter(
+    "robi_resource_reloads_total", "Resource (re)loads, by outcome.", ("outcome",))
+
+
+@contextmanager
+def span(timings: dict, stage: str, agent: str):
+    """
+    Times a stage with the monotonic clock: stores `<stage>_time` in the
+    request's timings and records it in the per-agent stage histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(timings, stage, agent, time.perf_counter() - start)
+
+
+def record_stage(timings: dict, stage: str, agent: str, elapsed: float):
+    timings[f"{stage}_time"] = elapsed
+    STAGE_SECONDS.observe(elapsed, agent=agent, stage=stage)
+
+
+def record_request(agent: str, start: float, outcome: str = "ok") -> float:
+    """
+    Records one answered question (`start` from time.perf_counter()) and
+    returns its duration.
+    """
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, agent=agent)
+    REQUESTS_TOTAL.inc(agent=agent, outcome=outcome)
+    return elapsed
+
+
+@contextmanager
+def track_in_flight():
+    IN_FLIGHT_REQUESTS.inc()
+    try:
+        yield
+    finally:
+        IN_FLIGHT_REQUESTS.dec()
@@ -0,0 +1,103 @@
+import re
+from .retrieval import Passage
+from .router import trie_pattern, KEYWORD_SUFFIX
+
+# Topics of the navigation guide and the words that identify them, both in
+# the guide's instructions and in users' questions.
+NAVIGATION_TOPICS = {
+    "movement": ['move', 'moving', 'walk', 'go', 'navigate', 'forward', 'backward', 'strafe',
+                 'left joystick', 'speed', 'pace', 'fast', 'faster', 'slow', 'slower', 'run'],
+    "turning": ['turn', 'rotate', 'rotation', 'perspective', 'right joystick', 'avatar', 'spin'],
+    "interacting": ['select', 'interact', 'trigger', 'point', 'click', 'ui', 'canvas', 'menu'],
+    "grabbing": ['grab', 'grip', 'pick', 'pick up', 'hold', 'drop', 'carry', 'object', 'icon',
+                 'box', 'release', 'handle', 'thing'],
+    "summoning_robi": ['summon', 'robi', 'b button', 'conversation', 'talk', 'speak', 'hear'],
+}
+
+BULLET = re.compile(r"^(?:o|-|•)\s+")
+MAX_HEADING_WORDS = 6
+
+
+def clean_text(text: str) -> str:
+    """Joins PDF line fragments and removes the stray spaces PyPDF2 leaves."""
+    text = re.sub(r"\s+", " ", text).strip()
+    return re.sub(r"\s+([.,:;!?])", r"\1", text)
+
+
+def parse_guide(text: str):
+    """
+    Splits the guide into (heading, item) pairs, one per bullet or
+    paragraph, in document order. Short lines ending with ':' are headings;
+    text before the first heading is the introduction (heading None).
+    """
+    items, heading, current = [], None, []
+
+    def flush():
+        if current:
+            items.append((heading, clean_text(" ".join(current))))
+            current.clear()
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        bare = BULLET.sub("", line)
+        if bare.endswith(":") and len(bare.split()) <= MAX_HEADING_WORDS:
+            flush()
+            heading = bare[:-1].strip()
+        elif BULLET.match(line) or (current and current[-1].rstrip().endswith((".", ":", "?", "!"))
+                                    and not line[0].islower()):
+            flush()
+            current.append(bare)
+        else:
+            current.append(line)
+    flush()
+    return items
+
+
+class NavigationGuide:
+    """
+    The navigation guide parsed once into addressable sections. Each
+    instruction is tagged with the topics (movement, turning, interacting,
+    grabbing, summoning ROBI) it covers; a question gets only the
+    instructions of the topics it mentions.
+    """
+    def __init__(self, text: str, topics: dict = None):
+        topics = topics or NAVIGATION_TOPICS
+        self.items = parse_guide(text)
+        self.patterns = {topic: re.compile(rf"\b(?:{trie_pattern(words)}){KEYWORD_SUFFIX}\b")
+                         for topic, words in topics.items()}
+        self.sections = {topic: [] for topic in topics}  # topic -> item indices
+        for index, (heading, item) in enumerate(self.items):
+            if heading is None:
+                continue  # The introduction has no instructions
+            for topic in self.topics_for(item):
+                self.sections[topic].append(index)
+
+    def topics_for(self, text: str):
+        text = text.lower()
+        return [topic for topic, pattern in self.patterns.items() if pattern.search(text)]
+
+    def lookup(self, query: str):
+        """
+        Returns the guide instructions for the topics in the query, each
+        once and in document order, as Passages with the heading as source.
+        Questions that match no topic get the whole guide.
+        """
+        indices = sorted({index for topic in self.topics_for(query) for index in self.sections[topic]})
+        if not indices:
+            indices = range(len(self.items))
+        return [Passage(self.items[index][0] or "Introduction", self.items[index][1], 1.0) for index in indices]
+
+    @staticmethod
+    def format(passages) -> str:
+        """
+        Formats instructions grouped under their headings.
+        """
+        lines, heading = [], None
+        for passage in passages:
+            if passage.source != heading:
+                heading = passage.source
+                lines.append(f"{heading}:")
+            lines.append(f"- {passage.text}")
+        return "\n".join(lines)
@@ -0,0 +1,32 @@
+from .conversation_memory import estimate_tokens
+
+
+class PromptTooLongError(ValueError):
+    """Raised when a prompt exceeds its agent's token budget even after trimming."""
+
+
+class PromptTemplate:
+    """
+    An agent's prompt compiled once: an immutable static prefix (persona,
+    style guide, rules) whose token count is computed up front, and a small
+    dynamic suffix filled in per request. Every prompt of an agent starts
+    with the same prefix, so providers can reuse it (prefix caching).
+    The suffix is a str.format template with {user_name}, {context} and
+    {query} fields.
+    """
+    def __init__(self, prefix: str, suffix: str):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.prefix_tokens = estimate_tokens(prefix)
+
+    def render_suffix(self, query: str, user_name: str = "User", context: str = "") -> str:
+        return self.suffix.format(query=query, user_name=user_name, context=context)
+
+    def count_tokens(self, suffix: str) -> int:
+        """
+        Estimated tokens of prefix + suffix; only the suffix is measured.
+        """
+        return self.prefix_tokens + estimate_tokens(suffix)
+
+    def render(self, query: str, user_name: str = "User", context: str = "") -> str:
+        return self.prefix + self.render_suffix(query, user_name, context)
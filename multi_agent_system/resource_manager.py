@@ -1,72 +1,365 @@
 import os
 import glob
+import json
 import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import PyPDF2
-import google.generativeai as genai
+from .retrieval import LexicalIndex, EmbeddingStore, Passage, chunk_text
+from .navigation_guide import NavigationGuide
+from .llm_backend import GeminiBackend
+from .metrics import METRICS, RELOAD_SECONDS, RELOADS_TOTAL
+from .structured_logging import log_event
+
+MANIFEST_NAME = ".upload_manifest.json"
+EMBEDDINGS_DIR = ".embeddings"
+EXPIRY_MARGIN = 3600.0  # Re-upload files that expire within this many seconds
+NAV_GUIDE_NAME = "NAVIGATION_control.pdf"
+
+# Agents whose answers must come from specific documents only search those.
+AGENT_SOURCES = {
+    "location": ("CONTEXT_Rooms_And_Tasks.pdf",),
+    "navigation": (NAV_GUIDE_NAME,),
+}
+
+logger = logging.getLogger(__name__)
+
+class ResourceSnapshot:
+    """
+    Complete, read-only view of the loaded resources. A request reads the
+    current snapshot once and keeps using it; reloads build a new snapshot
+    and swap it in, so readers never see a partial document set.
+    """
+    def __init__(self, files_by_path: dict, digests: dict, texts: dict, nav_guide: str, version: int,
+                 embedding_store: EmbeddingStore = None):
+        self.files_by_path = dict(files_by_path)  # path -> uploaded Gemini file
+        self.files = tuple(files_by_path[path] for path in sorted(files_by_path))
+        self.digests = dict(digests)  # path -> content hash
+        # Identifies the document set, e.g. for artifacts built from it (the FAQ store).
+        self.fingerprint = hashlib.sha256(json.dumps(
+            sorted((os.path.basename(path), digest) for path, digest in self.digests.items())).encode("utf-8")
+        ).hexdigest()[:16]
+        self.texts = dict(texts)  # path -> extracted text
+        self.nav_guide = nav_guide
+        self.nav_sections = NavigationGuide(nav_guide)  # The guide split into topic sections
+        self.version = version
+        self.passages = [(os.path.basename(path), chunk)
+                         for path in sorted(self.texts) for chunk in chunk_text(self.texts[path])]
+        self.index = LexicalIndex(self.passages)
+        self.dense_index = embedding_store.build_index(self.passages) if embedding_store else None
+
 
 class ResourceManager:
     """
     Manages loading and uploading of PDF resources.
+    Uploads are recorded in a manifest (content hash -> remote file), so
+    unchanged PDFs are reused instead of being uploaded again. Reloads are
+    incremental and swap in a new ResourceSnapshot atomically.
     """
-    def __init__(self, resource_dir="uSucceed_resource"):
+    def __init__(self, resource_dir="uSucceed_resource", max_workers: int = 8,
+                 ready_timeout: float = 600.0, poll_interval: float = 0.5, max_poll_interval: float = 10.0,
+                 manifest_path: str = None, dense_index: bool = False, embeddings_dir: str = None,
+                 backend=None):
         self.resource_dir = resource_dir
-        self.files = []  # List of uploaded file objects from Gemini
-        self.nav_guide = ""  # Content from the NAVIGATION_control.pdf file
-        self.loaded = False
+        self.backend = backend or GeminiBackend()  # Where the PDFs are uploaded (shared with the agents)
+        self.manifest_path = manifest_path or os.path.join(resource_dir, MANIFEST_NAME)
+        # Optional dense passage index, persisted and memory-mapped from embeddings_dir.
+        self.embedding_store = None
+        if dense_index:
+            self.embedding_store = EmbeddingStore(embeddings_dir or os.path.join(resource_dir, EMBEDDINGS_DIR))
+        self.snapshot = ResourceSnapshot({}, {}, {}, "", version=0)
+        self.max_workers = max_workers  # Concurrent uploads / status checks
+        self.ready_timeout = ready_timeout  # Deadline for all files to become ACTIVE
+        self.poll_interval = poll_interval  # First wait between status checks, doubled each round
+        self.max_poll_interval = max_poll_interval
+        self.load_report = {}  # display_name -> per-file timings of the last load
+        self._manifest_lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # One reload at a time
+        self._reload_listeners = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        METRICS.gauge("robi_resource_snapshot_version", "Version of the resource snapshot being served.",
+                      function=lambda: self.snapshot.version)
+        METRICS.gauge("robi_resource_files", "PDF files in the resource snapshot being served.",
+                      function=lambda: len(self.snapshot.files))
+
+    @property
+    def files(self):
+        """List of uploaded file objects from Gemini (current snapshot)."""
+        return self.snapshot.files
+
+    @property
+    def nav_guide(self):
+        """Content from the NAVIGATION_control.pdf file (current snapshot)."""
+        return self.snapshot.nav_guide
+
+    @property
+    def loaded(self):
+        return self.snapshot.version > 0
+
+    def add_reload_listener(self, callback):
+        """
+        Registers `callback(snapshot)`, called after each new snapshot is swapped in.
+        """
+        self._reload_listeners.append(callback)
 
     def load_resources(self):
         """
-        Loads all PDF files from the resource directory, uploads them to Gemini,
-        and caches the navigation guide separately.
+        Loads all PDF files from the resource directory into a new snapshot.
+        Files whose content is unchanged since the current snapshot are kept
+        as they are; new or changed ones are uploaded to Gemini and have their
+        text extracted in parallel, and the passage index is rebuilt. The new
+        snapshot replaces the current one only once it is complete.
         """
-        file_paths = glob.glob(os.path.join(self.resource_dir, "*.pdf"))
-        self.files = []
-        for path in file_paths:
-            file_obj = genai.upload_file(path, mime_type="application/pdf")
-            print(f"Uploaded file '{file_obj.display_name}' as: {file_obj.uri}")
-            self.files.append(file_obj)
+        start = time.monotonic()
+        try:
+            snapshot = self._load_snapshot()
+        except Exception:
+            RELOADS_TOTAL.inc(outcome="error")
+            raise
+        finally:
+            RELOAD_SECONDS.observe(time.monotonic() - start)
+        RELOADS_TOTAL.inc(outcome="ok")
+        for callback in self._reload_listeners:
+            callback(snapshot)
 
-        self.wait_for_files_active(self.files)
-        self._load_navigation_guide()
-        self.loaded = True
+    def _load_snapshot(self):
+        with self._reload_lock:
+            current = self.snapshot
+            file_paths = sorted(glob.glob(os.path.join(self.resource_dir, "*.pdf")))
+            self.load_report = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                digests = dict(zip(file_paths, pool.map(self.file_hash, file_paths)))
+                unchanged = [path for path in file_paths if current.digests.get(path) == digests[path]]
+                # Unchanged files are kept only while their upload is still live;
+                # expired ones are uploaded again like changed files.
+                kept = pool.map(lambda path: self._reuse_file(self._manifest_entry(current.files_by_path[path]),
+                                                              os.path.basename(path)), unchanged)
+                files_by_path = {path: file_obj for path, file_obj in zip(unchanged, kept) if file_obj is not None}
+                changed = [path for path in file_paths if path not in files_by_path]
 
-    def wait_for_files_active(self, files):
+                manifest = self._read_manifest()
+                updated_manifest = {digests[path]: self._manifest_entry(file_obj)
+                                    for path, file_obj in files_by_path.items()}
+                uploads = [pool.submit(self._get_or_upload_file, path, digests[path], manifest, updated_manifest)
+                           for path in changed]
+                texts = {path: current.texts[path] for path in unchanged}
+                new_paths = [path for path in changed if path not in texts]
+                texts.update(zip(new_paths, pool.map(self._extract_text, new_paths)))
+                uploaded = [future.result() for future in uploads]
+            self._write_manifest(updated_manifest)
+            if uploaded:
+                self.wait_for_files_active(uploaded)
+            files_by_path.update(zip(changed, uploaded))
+
+            nav_path = os.path.join(self.resource_dir, NAV_GUIDE_NAME)
+            if nav_path not in texts:
+                logger.warning("Navigation control PDF not found.")
+
+            snapshot = ResourceSnapshot(files_by_path, digests, texts, texts.get(nav_path, ""),
+                                        version=current.version + 1, embedding_store=self.embedding_store)
+            self.snapshot = snapshot
+            log_event(logger, logging.INFO, "Loaded resource snapshot", version=snapshot.version,
+                      changed=len(changed), files=len(file_paths), load_report=dict(self.load_report))
+        return snapshot
+
+    def reload_in_background(self):
+        """
+        Reloads the resources on a background thread; requests keep using the
+        current snapshot until the new one is ready.
+        """
+        thread = threading.Thread(target=self._safe_reload, daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_reload(self):
+        try:
+            self.load_resources()
+        except Exception:
+            logger.exception("Failed to reload resources")
+
+    def start_watching(self, interval: float = 5.0):
+        """
+        Polls the resource directory and reloads whenever a PDF is added,
+        removed or modified.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _directory_signature(self):
+        signature = []
+        for path in sorted(glob.glob(os.path.join(self.resource_dir, "*.pdf"))):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _watch(self, interval: float):
+        signature = self._directory_signature()
+        while not self._stop_watching.wait(interval):
+            current = self._directory_signature()
+            if current != signature:
+                signature = current
+                logger.info("Resource directory changed, reloading")
+                self._safe_reload()
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """
+        Returns the SHA-256 hex digest of a file's content.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest: dict):
+        # Write to a temporary file first so a crash never leaves a truncated manifest.
+        tmp_path = self.manifest_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(manifest, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            logger.warning("Could not write upload manifest: %s", e)
+
+    def _reuse_file(self, entry: dict, display_name: str):
         """
-        Waits until each file is processed (state ACTIVE) by Gemini.
-        """
-        print("Waiting for file processing...")
-        for file in files:
-            file_obj = genai.get_file(file.name)
-            while file_obj.state.name == "PROCESSING":
-                print(".", end="", flush=True)
-                time.sleep(10)
-                file_obj = genai.get_file(file.name)
-            if file_obj.state.name != "ACTIVE":
-                raise Exception(f"File {file_obj.name} failed to process")
-        print("\n...all files ready\n")
-
-    def _load_navigation_guide(self):
-        """
-        Reads and caches the navigation guide from NAVIGATION_control.pdf.
-        """
-        nav_path = os.path.join(self.resource_dir, "NAVIGATION_control.pdf")
-        if os.path.exists(nav_path):
-            with open(nav_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
-                pages = [page.extract_text() for page in reader.pages]
-                self.nav_guide = "\n".join(pages)
+        Returns the remote file recorded in a manifest entry if it still exists,
+        is not about to expire and was uploaded under the same name.
+        """
+        if not entry or entry.get("display_name") != display_name:
+            return None
+        expires = entry.get("expiration_time")
+        if expires is not None and expires < time.time() + EXPIRY_MARGIN:
+            return None
+        try:
+            file_obj = self.backend.get_file(entry["name"])
+        except Exception:
+            return None
+        if file_obj.state.name not in ("ACTIVE", "PROCESSING"):
+            return None
+        return file_obj
+
+    @staticmethod
+    def _manifest_entry(file_obj) -> dict:
+        expiration_time = getattr(file_obj, "expiration_time", None)
+        return {
+            "name": file_obj.name,
+            "uri": file_obj.uri,
+            "display_name": file_obj.display_name,
+            "expiration_time": expiration_time.timestamp() if expiration_time else None,
+        }
+
+    def _get_or_upload_file(self, path, digest: str, manifest: dict, updated_manifest: dict):
+        start = time.monotonic()
+        display_name = os.path.basename(path)
+        file_obj = self._reuse_file(manifest.get(digest), display_name)
+        if file_obj is not None:
+            self.load_report[file_obj.display_name] = {"reuse_time": time.monotonic() - start}
+            log_event(logger, logging.INFO, "Reusing uploaded file", file=file_obj.display_name, uri=file_obj.uri)
         else:
-            print("Navigation control PDF not found.")
+            file_obj = self.backend.upload_file(path, mime_type="application/pdf", display_name=display_name)
+            self.load_report[file_obj.display_name] = {"upload_time": time.monotonic() - start}
+            log_event(logger, logging.INFO, "Uploaded file", file=file_obj.display_name, uri=file_obj.uri)
 
-    def get_files_for_agent(self, agent_type: str):
+        with self._manifest_lock:
+            updated_manifest[digest] = self._manifest_entry(file_obj)
+        return file_obj
+
+    def wait_for_files_active(self, files):
+        """
+        Waits until every file is processed (state ACTIVE) by Gemini.
+        All pending files are checked together each round, backing off
+        exponentially between rounds, until `ready_timeout` expires.
+        """
+        log_event(logger, logging.INFO, "Waiting for file processing", files=len(files))
+        start = time.monotonic()
+        deadline = start + self.ready_timeout
+        interval = self.poll_interval
+        pending = {file.name: file.display_name for file in files}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending:
+                for file_obj in pool.map(self.backend.get_file, list(pending)):
+                    state = file_obj.state.name
+                    if state == "PROCESSING":
+                        continue
+                    if state != "ACTIVE":
+                        raise Exception(f"File {file_obj.name} failed to process")
+                    display_name = pending.pop(file_obj.name)
+                    self.load_report.setdefault(display_name, {})["ready_time"] = time.monotonic() - start
+                if not pending:
+                    break
+                if time.monotonic() + interval > deadline:
+                    raise Exception(f"Timed out waiting for files to process: {sorted(pending.values())}")
+                log_event(logger, logging.DEBUG, "Files still processing", pending=len(pending))
+                time.sleep(interval)
+                interval = min(interval * 2, self.max_poll_interval)
+        log_event(logger, logging.INFO, "All files ready", wait_time=time.monotonic() - start)
+
+    @staticmethod
+    def _extract_text(path: str) -> str:
+        """
+        Extracts the text of a PDF, one page per line block.
+        """
+        with open(path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            pages = [page.extract_text() or "" for page in reader.pages]
+            return "\n".join(pages)
+
+    def get_files_for_agent(self, agent_type: str, snapshot: ResourceSnapshot = None):
         """
         Returns a prioritized list of files based on the agent type.
         For example, the LocationAgent prioritizes the 'CONTEXT_Rooms_And_Tasks.pdf'.
+        Pass `snapshot` to read from a specific snapshot instead of the current one.
         """
+        files = (snapshot or self.snapshot).files
         # if agent_type == "location":
         #     prioritized = [f for f in self.files if "CONTEXT_Rooms_And_Tasks.pdf" in f.display_name]
         #     print(f"Prioritized files: {[f.display_name for f in prioritized]}")
         #     others = [f for f in self.files if "CONTEXT_Rooms_And_Tasks.pdf" not in f.display_name]
         #     return prioritized + others
         # For other agent types, return all files.
-        return self.files
+        return files
+
+    def search(self, query: str, agent_type: str = None, k: int = 4, snapshot: ResourceSnapshot = None,
+               dense: bool = True):
+        """
+        Returns the k passages most relevant to the query, limited to the
+        documents the given agent type is allowed to use. With a dense index,
+        keyword and embedding results are merged by reciprocal rank fusion;
+        dense=False returns keyword results only, scored by TF-IDF cosine
+        similarity.
+        """
+        snapshot = snapshot or self.snapshot
+        sources = AGENT_SOURCES.get(agent_type)
+        lexical = snapshot.index.search(query, k=k, sources=sources)
+        if snapshot.dense_index is None or not dense:
+            return lexical
+        dense = snapshot.dense_index.search(query, k=k, sources=sources)
+        fused = {}
+        for results in (lexical, dense):
+            for rank, passage in enumerate(results):
+                key = (passage.source, passage.text)
+                fused[key] = fused.get(key, 0.0) + 1.0 / (60 + rank)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [Passage(source, text, score) for (source, text), score in ranked]
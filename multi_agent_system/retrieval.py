@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+Passage = namedtuple("Passage", ["source", "text", "score"])
+
+# Words of two or more characters plus single digits, so "room 3" keeps its number.
+TOKEN_PATTERN = r"(?u)\b(?:\w\w+|\d)\b"
+# Room names as sent by the VR client ("roomname: room3") are split like the documents write them.
+ROOM_NUMBER = re.compile(r"\b(room)(\d+)\b")
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_text(text: str, max_words: int = 120, overlap: int = 30):
+    """
+    Splits text into overlapping passages of at most `max_words` words.
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(max_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def preprocess(text: str) -> str:
+    """
+    Lowercases text and splits room names: "Room3" becomes "room 3".
+    """
+    return ROOM_NUMBER.sub(r"\1 \2", text.lower())
+
+
+def select_top_k(scores: np.ndarray, k: int):
+    """
+    Returns the indices of the k highest positive scores, best first.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [int(i) for i in top if scores[i] > 0]
+
+
+class TfidfQueryVectorizer:
+    """
+    Vectorizes single queries with a fitted TfidfVectorizer's analyzer,
+    vocabulary and idf weights, without its per-call validation overhead.
+    Returns the L2-normalized vector as (column indices, weights).
+    """
+    def __init__(self, vectorizer: TfidfVectorizer):
+        self.analyzer = vectorizer.build_analyzer()
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = vectorizer.idf_
+        self.sublinear_tf = vectorizer.sublinear_tf
+
+    def __call__(self, text: str):
+        counts = {}
+        for term in self.analyzer(text):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        weights = (1.0 + np.log(tf) if self.sublinear_tf else tf) * self.idf[columns]
+        norm = np.linalg.norm(weights)
+        return columns, (weights / norm if norm else weights)
+
+
+class LexicalIndex:
+    """
+    In-memory TF-IDF index over resource passages. Passage vectors are
+    L2-normalized and stored column-wise, so a query only touches the
+    columns of its own terms.
+    """
+    def __init__(self, passages):
+        # passages: iterable of (source, text)
+        passages = list(passages)
+        self.sources = np.array([source for source, _ in passages], dtype=object)
+        self.texts = [text for _, text in passages]
+        self.matrix = None
+        if self.texts:
+            vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True, ngram_range=(1, 2),
+                                         preprocessor=preprocess, token_pattern=TOKEN_PATTERN)
+            self.matrix = vectorizer.fit_transform(self.texts).tocsc()
+            self._vectorize = TfidfQueryVectorizer(vectorizer)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query: str, k: int = 4, sources=None):
+        """
+        Returns up to k passages most relevant to the query, optionally
+        restricted to the given source file names.
+        """
+        if self.matrix is None or k <= 0:
+            return []
+        columns, weights = self._vectorize(query)
+        if not columns.size:
+            return []
+        scores = self.matrix[:, columns] @ weights
+        if sources:
+            scores[~np.isin(self.sources, list(sources))] = 0.0
+        return [Passage(self.sources[i], self.texts[i], float(scores[i])) for i in select_top_k(scores, k)]
+
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    Loads a sentence-transformers model once per process.
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def encode_normalized(encoder, texts) -> np.ndarray:
+    """
+    Embeds texts as unit-length float32 rows.
+    """
+    vectors = np.asarray(encoder.encode(list(texts)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def passage_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class DenseIndex:
+    """
+    Embedding index over resource passages. `matrix` holds one unit-length
+    float32 row per passage (usually memory-mapped), so a query is a single
+    matrix-vector product followed by a top-k pick.
+    """
+    def __init__(self, passages, matrix: np.ndarray, encoder):
+        self.sources = np.array([source for source, _ in passages], dtype=object)
+        self.texts = [text for _, text in passages]
+        self.matrix = matrix
+        self.encoder = encoder
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query: str, k: int = 4, sources=None):
+        if not self.texts or k <= 0:
+            return []
+        scores = self.matrix @ encode_normalized(self.encoder, [query])[0]
+        if sources:
+            scores[~np.isin(self.sources, list(sources))] = 0.0
+        return [Passage(self.sources[i], self.texts[i], float(scores[i])) for i in select_top_k(scores, k)]
+
+
+class EmbeddingStore:
+    """
+    Persists passage embeddings in `directory` as one contiguous float32
+    matrix (.npy) plus a metadata file listing the content hash of each row.
+    The matrix is memory-mapped, so worker processes share it through the
+    page cache, and passages whose content is unchanged are never re-embedded.
+    """
+    META_NAME = "embeddings.json"
+
+    def __init__(self, directory: str, model_name: str = DEFAULT_EMBEDDING_MODEL, encoder=None):
+        self.directory = directory
+        self.model_name = model_name
+        self._encoder = encoder
+        self._lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = get_encoder(self.model_name)
+        return self._encoder
+
+    def _load(self):
+        """
+        Returns (row hashes, memory-mapped matrix) of the stored embeddings.
+        """
+        try:
+            with open(os.path.join(self.directory, self.META_NAME), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            if meta["model_name"] != self.model_name:
+                return [], None
+            matrix = np.load(os.path.join(self.directory, meta["matrix"]), mmap_mode="r")
+            return meta["keys"], matrix
+        except (OSError, ValueError, KeyError):
+            return [], None
+
+    def _save(self, keys, matrix: np.ndarray):
+        os.makedirs(self.directory, exist_ok=True)
+        # Content-addressed file name: readers still mapping the old matrix are unaffected.
+        digest = hashlib.sha1("".join(keys).encode("utf-8")).hexdigest()[:16]
+        matrix_name = f"embeddings-{digest}.npy"
+        np.save(os.path.join(self.directory, matrix_name), matrix)
+        meta_path = os.path.join(self.directory, self.META_NAME)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"model_name": self.model_name, "matrix": matrix_name, "keys": keys}, file)
+        os.replace(meta_path + ".tmp", meta_path)
+        for name in os.listdir(self.directory):
+            if name.startswith("embeddings-") and name.endswith(".npy") and name != matrix_name:
+                os.remove(os.path.join(self.directory, name))
+
+    def build_index(self, passages) -> DenseIndex:
+        """
+        Returns a DenseIndex for the passages, embedding only those not
+        already stored and rewriting the stored matrix if anything changed.
+        """
+        passages = list(passages)
+        keys = [passage_hash(text) for _, text in passages]
+        with self._lock:
+            stored_keys, stored = self._load()
+            if stored is None or keys != stored_keys:
+                row_of = {key: row for row, key in enumerate(stored_keys)}
+                missing = [i for i, key in enumerate(keys) if key not in row_of]
+                logger.info("Embedding %d of %d passages", len(missing), len(keys))
+                new_rows = encode_normalized(self.encoder, [passages[i][1] for i in missing]) if missing else None
+                dim = stored.shape[1] if stored is not None else new_rows.shape[1] if new_rows is not None else 0
+                matrix = np.empty((len(keys), dim), dtype=np.float32)
+                for i, key in enumerate(keys):
+                    if key in row_of:
+                        matrix[i] = stored[row_of[key]]
+                for new_row, i in enumerate(missing):
+                    matrix[i] = new_rows[new_row]
+                self._save(keys, matrix)
+                stored_keys, stored = self._load()
+        return DenseIndex(passages, stored, self.encoder)
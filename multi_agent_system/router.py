@@ -0,0 +1,120 @@
+import re
+
+# Keyword tables per query type, in priority order (ties go to the earlier type).
+QUERY_KEYWORDS = {
+    "location": ['room', 'roomname', 'location', 'where', 'place', 'area', 'task', 'cube'],
+    "cybersecurity": [
+        'security', 'cyber', 'cybersecurity', 'attack', 'threat', 'protection', 'ddos', 'dns',
+        'firewall', 'encryption', 'malware', 'phishing', 'ransomware',
+        'vulnerability', 'penetration', 'breach', 'authentication', 'intrusion',
+        'zero-day', 'exploit', 'mitigation', 'defense', 'incident', 'forensics',
+        'safety', 'network security', 'data breach', 'password', 'access control',
+        'ids', 'ips', 'iot security', 'cloud security', 'endpoint security',
+        'web security', 'mobile security'
+    ],
+    "system": [
+        'controller', 'system', 'asset', 'configuration', 'architecture',
+        'setup', 'installation', 'framework', 'protocol', 'integration',
+        'hardware', 'software', 'deployment', 'infrastructure', 'operating system',
+        'network', 'server', 'database', 'automation', 'monitoring',
+        'maintenance', 'device', 'tool', 'resource management', 'scalability'
+    ],
+    "navigation": [
+        'move', 'moving', 'go', 'navigate', 'walk', 'forward', 'backward', 'strafe',
+        'left', 'right', 'joystick', 'speed', 'pace', 'rotate', 'turn',
+        'perspective', 'direction', 'adjust', 'push', 'pressure', 'click',
+        'button', 'trigger', 'grip', 'a button', 'b button',
+        'interact', 'grab', 'hold', 'drop', 'summon', 'robi',
+        'object', 'icon', 'box', 'select', 'outline', 'highlight',
+        'hover', 'conversation', 'appear', 'materialize', 'hear',
+        'respond', 'audio input', 'release', 'troubleshoot'
+    ],
+}
+DEFAULT_QUERY_TYPE = "other"
+
+# Inflections accepted after a keyword ("attacks", "summoning", "room3").
+KEYWORD_SUFFIX = r"(?:s|es|d|ed|ing|\d+)?"
+
+
+def trie_pattern(words) -> str:
+    """
+    Builds a regex alternation of the words factored as a prefix trie
+    ("se(?:curity|lect|rver)"), which the regex engine matches far faster
+    than a flat list of alternatives. Longer words are preferred.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
+class KeywordRouter:
+    """
+    Routes queries by keyword. All keyword tables are compiled once into a
+    single word-bounded, trie-factored pattern, so one pass over the query
+    scores every query type ("go" no longer matches "good", nor "ids" "kids").
+    """
+    def __init__(self, keywords: dict = None):
+        keywords = keywords or QUERY_KEYWORDS
+        self.priority = {query_type: rank for rank, query_type in enumerate(keywords)}
+        self.lookup = {}  # keyword -> query type
+        for query_type, words in keywords.items():
+            for word in words:
+                self.lookup.setdefault(word, query_type)
+        self.pattern = re.compile(rf"\b({trie_pattern(self.lookup)}){KEYWORD_SUFFIX}\b")
+
+    def rank(self, query: str):
+        """
+        Returns [(query_type, score), ...] best first, where the score is the
+        number of keyword hits. Falls back to [("other", 0)].
+        """
+        scores = {}
+        for keyword in self.pattern.findall(query.lower()):
+            query_type = self.lookup[keyword]
+            scores[query_type] = scores.get(query_type, 0) + 1
+        if not scores:
+            return [(DEFAULT_QUERY_TYPE, 0)]
+        return sorted(scores.items(), key=lambda item: (-item[1], self.priority[item[0]]))
+
+    def detect(self, query: str) -> str:
+        return self.rank(query)[0][0]
+
+
+KEYWORD_ROUTER = KeywordRouter()  # Compiled once per process
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[?.!])\s+")
+
+
+def split_compound_query(query: str, is_name_statement=None):
+    """
+    Splits a compound query into (name_statements, sub_questions).
+    Fragments that are neither questions nor name statements (e.g.,
+    "roomname: room3" or "I am at room 1.") are context: leading context is
+    prefixed and any other context appended to every sub-question.
+    A query with fewer than two questions is not split: ([], [query]).
+    """
+    fragments = [fragment.strip() for fragment in SENTENCE_BOUNDARY.split(query.strip()) if fragment.strip()]
+    names, questions, leading, trailing = [], [], [], []
+    for fragment in fragments:
+        if is_name_statement is not None and is_name_statement(fragment):
+            names.append(fragment)
+        elif fragment.endswith("?"):
+            questions.append(fragment)
+        else:
+            (trailing if questions else leading).append(fragment)
+    if len(questions) < 2:
+        return [], [query]
+    return names, [" ".join(leading + [question] + trailing) for question in questions]
@@ -0,0 +1,275 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from .metrics import METRICS
+from .deadlines import DeadlineExceeded, remaining
+from .structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first: headset questions go ahead of evaluation runs.
+PRIORITIES = ("interactive", "batch")
+PRIORITY = contextvars.ContextVar("priority", default="interactive")
+
+RETRYABLE_STATUS = (429, 503)  # Rate limited, overloaded
+
+SCHEDULER_QUEUE_DEPTH = METRICS.gauge(
+    "robi_scheduler_queue_depth", "Model calls waiting for rate-limit capacity, by priority.", ("priority",))
+SCHEDULER_WAIT_SECONDS = METRICS.histogram(
+    "robi_scheduler_wait_seconds", "Time model calls waited for rate-limit capacity, by priority.", ("priority",))
+SCHEDULER_RETRIES = METRICS.counter(
+    "robi_scheduler_retries_total", "Model calls retried after being throttled, by priority.", ("priority",))
+SCHEDULER_REJECTED = METRICS.counter(
+    "robi_scheduler_throttled_total", "Model calls that stayed throttled after every retry, by priority.",
+    ("priority",))
+
+
+class RateLimitedError(Exception):
+    """Raised when a model call is still throttled after all retries."""
+
+
+@contextmanager
+def priority_context(priority: str = None):
+    """
+    Sets the priority class of every model call made inside the block.
+    """
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}.")
+    token = PRIORITY.set(priority or PRIORITY.get())
+    try:
+        yield PRIORITY.get()
+    finally:
+        PRIORITY.reset(token)
+
+
+def is_throttled(error: Exception) -> bool:
+    """
+    Whether a model call failed because of rate limits or overload. Google
+    API errors carry the HTTP status as `code`; others are recognized by a
+    leading status in the message.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return str(error)[:3] in {str(status) for status in RETRYABLE_STATUS}
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units evenly over a minute, holding at most a
+    minute's worth. A limit of 0 or None means unlimited.
+    """
+    def __init__(self, per_minute: float = None):
+        self.per_minute = per_minute or 0
+        self.capacity = float(self.per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` is available (0 if it is now); requests
+        larger than the bucket only need it full.
+        """
+        if not self.per_minute:
+            return 0.0
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) * 60.0 / self.per_minute
+
+    def take(self, amount: float):
+        if self.per_minute:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, tokens: float, wake):
+        self.tokens = tokens
+        self.wake = wake  # Called (under the scheduler lock) once admitted
+        self.cancelled = False  # Caller gave up waiting; skipped when it reaches the front
+
+
+class RequestScheduler:
+    """
+    Admits every model call through two token buckets, requests per minute
+    and tokens per minute, in strict priority order (first come, first
+    served within a class). Calls that come back throttled (429/503) are
+    retried with jittered exponential backoff. Threaded and asyncio
+    callers share one queue.
+    """
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queue = []  # (priority rank, sequence, waiter)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries of a throttled burst over the whole window.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _enqueue(self, tokens: float, priority: str, wake):
+        with self._lock:
+            waiter = _Waiter(tokens, wake)
+            heapq.heappush(self._queue, (PRIORITIES.index(priority), next(self._sequence), waiter))
+            SCHEDULER_QUEUE_DEPTH.inc(priority=priority)
+            self._dispatch()
+        return waiter
+
+    def _cancel(self, waiter: _Waiter):
+        with self._lock:
+            waiter.cancelled = True
+            self._dispatch()
+
+    def _dispatch(self):
+        """
+        Admits queued calls from the front while both buckets have room;
+        otherwise sets a timer for when the front call will fit. Holds the lock.
+        """
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        while self._queue:
+            rank, _, waiter = self._queue[0]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                SCHEDULER_QUEUE_DEPTH.dec(priority=PRIORITIES[rank])
+                continue
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            heapq.heappop(self._queue)
+            SCHEDULER_QUEUE_DEPTH.dec(priority=PRIORITIES[rank])
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            waiter.wake()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def acquire(self, tokens: float = 0, priority: str = None) -> float:
+        """
+        Blocks until the call may be sent, at most until the current
+        deadline; returns the time waited.
+        """
+        priority = priority or PRIORITY.get()
+        start = time.perf_counter()
+        admitted = threading.Event()
+        waiter = self._enqueue(tokens, priority, admitted.set)
+        if not admitted.wait(remaining()):
+            self._cancel(waiter)
+            raise DeadlineExceeded("Deadline exceeded while waiting for rate-limit capacity.")
+        waited = time.perf_counter() - start
+        SCHEDULER_WAIT_SECONDS.observe(waited, priority=priority)
+        return waited
+
+    async def acquire_async(self, tokens: float = 0, priority: str = None) -> float:
+        priority = priority or PRIORITY.get()
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+        waiter = self._enqueue(tokens, priority, lambda: loop.call_soon_threadsafe(
+            lambda: admitted.done() or admitted.set_result(None)))
+        try:
+            await asyncio.wait_for(admitted, remaining())
+        except asyncio.TimeoutError:
+            self._cancel(waiter)
+            raise DeadlineExceeded("Deadline exceeded while waiting for rate-limit capacity.")
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+        waited = time.perf_counter() - start
+        SCHEDULER_WAIT_SECONDS.observe(waited, priority=priority)
+        return waited
+
+    def record_usage(self, tokens: float):
+        """
+        Charges tokens known only after the call (e.g., the answer's).
+        """
+        with self._lock:
+            self.tokens.refill(time.monotonic())
+            self.tokens.take(tokens)
+
+    def _retry_delay(self, error: Exception, attempt: int, priority: str):
+        """
+        Returns the backoff before the next attempt, or raises if the call
+        should not (or no longer) be retried, or the deadline would pass.
+        """
+        if not is_throttled(error):
+            raise error
+        if attempt >= self.max_retries:
+            SCHEDULER_REJECTED.inc(priority=priority)
+            raise RateLimitedError(f"Model is rate limited; gave up after {attempt + 1} attempts: {error}") from error
+        delay = self.backoff(attempt)
+        left = remaining()
+        if left is not None and delay >= left:
+            raise DeadlineExceeded(f"Deadline exceeded before the model call could be retried: {error}") from error
+        SCHEDULER_RETRIES.inc(priority=priority)
+        log_event(logger, logging.WARNING, "Model call throttled, retrying", attempt=attempt + 1,
+                  delay=round(delay, 3), priority=priority, error=str(error))
+        return delay
+
+    def call(self, func, tokens: float = 0, priority: str = None, timings: dict = None):
+        """
+        Runs `func()` once admitted, retrying throttled attempts (each
+        admitted again). The queue wait is added to timings["scheduler_wait"].
+        """
+        priority = priority or PRIORITY.get()
+        for attempt in itertools.count():
+            waited = self.acquire(tokens, priority)
+            if timings is not None:
+                timings["scheduler_wait"] = timings.get("scheduler_wait", 0.0) + waited
+            try:
+                return func()
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt, priority))
+
+    async def call_async(self, func, tokens: float = 0, priority: str = None, timings: dict = None):
+        """
+        Asyncio variant of call; `func()` returns an awaitable.
+        """
+        priority = priority or PRIORITY.get()
+        for attempt in itertools.count():
+            waited = await self.acquire_async(tokens, priority)
+            if timings is not None:
+                timings["scheduler_wait"] = timings.get("scheduler_wait", 0.0) + waited
+            try:
+                return await func()
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, priority))
+
+
+def create_scheduler() -> RequestScheduler:
+    """
+    Builds the scheduler from LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE
+    (unset or 0: unlimited) and LLM_MAX_RETRIES.
+    """
+    return RequestScheduler(
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+        tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    )
@@ -0,0 +1,136 @@
+import re
+import time
+import logging
+import threading
+import numpy as np
+from .answer_cache import AnswerCache
+from .retrieval import DEFAULT_EMBEDDING_MODEL, encode_normalized, get_encoder
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity for a paraphrase to reuse a cached answer.
+# Location answers depend on the room, so they need a closer match.
+DEFAULT_THRESHOLDS = {
+    "location": 0.93,
+    "navigation": 0.85,
+    "cybersecurity": 0.88,
+    "system": 0.88,
+    "other": 0.9,
+}
+
+
+class SemanticCache:
+    """
+    Answer cache for paraphrased questions. Each query is embedded with a
+    sentence-transformers model; stored query embeddings are kept (normalized)
+    in one NumPy matrix so a lookup is a single dot product and a top-1 pick.
+    A hit requires the per-agent similarity threshold to be met and any numbers
+    in the query (e.g., room numbers) to match, and the entry to come from the
+    same resource snapshot version. The least recently used entry is evicted
+    once `capacity` is reached.
+    """
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, capacity: int = 512,
+                 thresholds: dict = None, encoder=None):
+        self.model_name = model_name
+        self.capacity = capacity
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self._encoder = encoder  # Anything with encode(list_of_str) -> array; loaded lazily by default
+        self._matrix = None  # capacity x dim, float32, rows are unit vectors
+        self._agents = [None] * capacity
+        self._numbers = [None] * capacity
+        self._answers = [None] * capacity
+        self._versions = [None] * capacity
+        self._last_used = np.zeros(capacity)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.available = True  # False once the embedding model failed to load (e.g., offline)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = get_encoder(self.model_name)
+        return self._encoder
+
+    def embed(self, query: str) -> np.ndarray:
+        """
+        Returns the unit-length embedding of a query, or None if the
+        embedding model cannot be loaded (the cache is then bypassed).
+        """
+        if not self.available:
+            return None
+        try:
+            encoder = self.encoder
+        except Exception as e:
+            logger.warning("Semantic cache disabled, embedding model unavailable: %s", e)
+            self.available = False
+            return None
+        return encode_normalized(encoder, [query])[0]
+
+    @staticmethod
+    def _numbers_in(query: str) -> tuple:
+        return tuple(re.findall(r"\d+", query))
+
+    def get(self, agent_type: str, query: str, embedding: np.ndarray, user_name: str = "User",
+            version: int = None):
+        """
+        Returns (answer, similarity) for the closest cached question of this
+        agent type, or None if nothing is similar enough.
+        """
+        threshold = self.thresholds.get(agent_type)
+        with self._lock:
+            if threshold is None or self._size == 0 or embedding is None:
+                self.misses += 1
+                return None
+            scores = self._matrix[:self._size] @ embedding
+            mask = np.fromiter((agent == agent_type and stored == version for agent, stored
+                                in zip(self._agents[:self._size], self._versions[:self._size])),
+                               dtype=bool, count=self._size)
+            scores = np.where(mask, scores, -1.0)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < threshold or self._numbers[best] != self._numbers_in(query):
+                self.misses += 1
+                return None
+            self._last_used[best] = time.monotonic()
+            self.hits += 1
+            template = self._answers[best]
+        return AnswerCache.fill_template(template, user_name), similarity
+
+    def put(self, agent_type: str, query: str, embedding: np.ndarray, answer: str, user_name: str = None,
+            version: int = None):
+        """
+        Stores an answer under the query embedding, templating out `user_name`
+        if given, generated from resource snapshot `version`.
+        """
+        template = AnswerCache.to_template(answer, user_name)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, embedding.shape[0]), dtype=np.float32)
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._matrix[slot] = embedding
+            self._agents[slot] = agent_type
+            self._numbers[slot] = self._numbers_in(query)
+            self._answers[slot] = template
+            self._versions[slot] = version
+            self._last_used[slot] = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._agents = [None] * self.capacity
+            self._numbers = [None] * self.capacity
+            self._answers = [None] * self.capacity
+            self._versions = [None] * self.capacity
+            self._last_used[:] = 0
+
+    def __len__(self):
+        return self._size
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,116 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_SESSION = "default"
+
+
+class SessionStore:
+    """
+    Bounded store of per-session state (e.g., the user's name), keyed by the
+    session/client id sent with each request. Sessions are kept in
+    least-recently-used order, so lookup, refresh and eviction are all O(1).
+    Sessions idle for longer than `idle_ttl` seconds are dropped.
+    """
+    def __init__(self, capacity: int = 512, idle_ttl: float = 1800.0):
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # session_id -> [last_seen, state]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_state() -> dict:
+        return {"USER": "User"}
+
+    def get(self, session_id: str = None) -> dict:
+        """
+        Returns the state dict for a session, creating it if needed.
+        The returned dict is owned by that session only.
+        """
+        session_id = session_id or DEFAULT_SESSION
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and now - entry[0] > self.idle_ttl:
+                del self._sessions[session_id]
+                entry = None
+            if entry is None:
+                entry = [now, self._new_state()]
+                self._sessions[session_id] = entry
+                self._evict(now)
+            else:
+                entry[0] = now
+                self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def drop(self, session_id: str):
+        """
+        Forgets a session (e.g., when a headset disconnects).
+        """
+        with self._lock:
+            self._sessions.pop(session_id or DEFAULT_SESSION, None)
+
+    def _evict(self, now: float):
+        # Oldest sessions sit at the front: drop the idle ones, then trim to capacity.
+        while self._sessions:
+            last_seen, _ = next(iter(self._sessions.values()))
+            if now - last_seen <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+        while len(self._sessions) > self.capacity:
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def memory_usage(self) -> int:
+        """
+        Approximate number of bytes held by the store and its session state.
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+            total = sys.getsizeof(self._sessions)
+        for session_id, (_, state) in sessions:
+            total += sys.getsizeof(session_id) + self._sizeof(state)
+        return total
+
+    def history_tokens(self) -> dict:
+        """
+        Estimated tokens of conversation memory held by all sessions, by agent type.
+        """
+        with self._lock:
+            states = [state for _, state in self._sessions.values()]
+        totals = {}
+        for state in states:
+            for agent_type, memory in self._items(state.get("MEMORY", {})):
+                totals[agent_type] = totals.get(agent_type, 0) + memory.token_count()
+        return totals
+
+    @staticmethod
+    def _items(mapping: dict) -> list:
+        # Agents update session state without the store lock; copy again if it changed mid-copy.
+        while True:
+            try:
+                return list(mapping.items())
+            except RuntimeError:
+                continue
+
+    @classmethod
+    def _sizeof(cls, value) -> int:
+        if hasattr(value, "size_bytes"):  # e.g., ConversationMemory
+            return value.size_bytes()
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(sys.getsizeof(key) + cls._sizeof(item)
+                                              for key, item in cls._items(value))
+        return sys.getsizeof(value)
+
+    def stats(self) -> dict:
+        """
+        Returns the current session count and memory use.
+        """
+        return {
+            "sessions": len(self),
+            "capacity": self.capacity,
+            "memory_bytes": self.memory_usage(),
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from .deadlines import DeadlineExceeded, remaining
+
+
+class _Call:
+    """One in-flight call and the outcome its waiters receive."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, callers arriving while it runs wait for it and receive the
+    same result (or exception). Once the call finishes the key is free
+    again, so later calls run afresh. Waiters give up with DeadlineExceeded
+    when their own deadline passes first; if instead the first caller's
+    deadline passed (or, for asyncio callers, it was cancelled), waiters
+    with time left run the call again. Threaded and asyncio callers are
+    tracked separately.
+    """
+    def __init__(self):
+        self._calls = {}  # key -> _Call
+        self._futures = {}  # key -> asyncio.Future
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """
+        Returns (result, shared); shared is True when the result came from
+        another caller's call.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded("Deadline exceeded while waiting for an identical question.")
+            if isinstance(call.error, DeadlineExceeded) and remaining() != 0.0:
+                continue  # The other caller ran out of time, this one has not
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key, func):
+        """
+        Asyncio variant of do: `func` returns an awaitable, and waiting
+        callers await the first caller's result.
+        """
+        future = self._futures.get(key)
+        while future is not None:
+            self.coalesced += 1
+            # Shielded so a waiter that is cancelled does not cancel the shared call.
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), remaining()), True
+            except DeadlineExceeded:  # Raised by the shared call (a TimeoutError, so caught first)
+                if remaining() == 0.0:
+                    raise
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("Deadline exceeded while waiting for an identical question.") from None
+            except asyncio.CancelledError:
+                # Only the first caller was cancelled (e.g., its client went away): this one goes on.
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            # The other caller ran out of time or was cancelled, this one was not: run the call again.
+            future = self._futures.get(key)
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved even when nobody else was waiting.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._futures[key]
+        return result, False
+
+    def __len__(self):
+        return len(self._calls) + len(self._futures)
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from .metrics import METRICS
+
+# Id of the request being handled, attached to every record logged while handling it.
+REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+
+LOG_RECORDS_DROPPED = METRICS.counter(
+    "robi_log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def request_context(request_id: str = None):
+    """
+    Sets the request id for everything logged inside the block (a new one
+    unless given or already set by an outer request).
+    """
+    token = REQUEST_ID.set(request_id or REQUEST_ID.get() or new_request_id())
+    try:
+        yield REQUEST_ID.get()
+    finally:
+        REQUEST_ID.reset(token)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, exc_info=False, **fields):
+    """
+    Logs `event` with structured fields (rendered as JSON keys). Records are
+    formatted later on the logging thread, so mutable field values must not
+    change afterwards; pass copies.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tags records with the current request id and keeps only a `sample_rate`
+    share of requests below WARNING. Sampling is decided per request id, so
+    a sampled request keeps all of its lines.
+    """
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self._threshold = int(sample_rate * 0xFFFFFFFF)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = REQUEST_ID.get()
+        record.request_id = request_id
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        if request_id is None:
+            return True  # Startup and background work is rare; keep it
+        return zlib.crc32(request_id.encode("utf-8")) <= self._threshold
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue without ever waiting: when the queue
+    is full the record is dropped and counted. Formatting happens later, on
+    the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, event, request_id and
+    the record's structured fields.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+
+
+def configure_logging(level: str = None, sample_rate: float = None, stream=None, queue_size: int = 10000):
+    """
+    Routes all logging through a bounded in-memory queue to a background
+    thread that writes JSON lines to `stream` (stdout by default). Level and
+    sampling default to the LOG_LEVEL and LOG_SAMPLE_RATE environment
+    variables. Calling it again replaces the previous configuration.
+    """
+    global _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0")) if sample_rate is None else sample_rate
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestContextFilter(sample_rate))
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        for old in [h for h in root.handlers if isinstance(h, NonBlockingQueueHandler)]:
+            root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _listener = QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    return handler
+
+
+@atexit.register
+def _flush_logs():
+    # Write out whatever is still queued when the process exits.
+    if _listener is not None:
+        _listener.stop()
@@ -11,7 +11,7 @@ def reload_resources():
     
 def ask_question(query):
     try: #http://127.0.0.1:5000
-        response = requests.get("http://127.0.0.1:5000/ask", params={"query": query})
+        response = requests.get("http://127.0.0.1:5000/ask", params={"query": query, "priority": "batch"})
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error occurred: {e}")
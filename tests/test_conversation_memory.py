@@ -0,0 +1,69 @@
+import os
+import shutil
+import pytest
+from multi_agent_system.agents.cybersecurity_agent import CybersecurityAgent
+from multi_agent_system.conversation_memory import ConversationMemory
+from multi_agent_system.llm_backend import LocalBackend
+from multi_agent_system.prompt_template import PromptTooLongError
+from multi_agent_system.resource_manager import ResourceManager
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "uSucceed_resource")
+DOCUMENT_NAME = "6 types of cybersecurity attacks.pdf"
+# About 3000 characters, as long model answers are.
+LONG_ANSWER = "Here is what you should know about {question}. " + "Attackers keep trying new tricks. " * 88
+
+
+@pytest.fixture(scope="module")
+def resource_manager(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("resources")
+    shutil.copy(os.path.join(RESOURCE_DIR, DOCUMENT_NAME), directory / DOCUMENT_NAME)
+    manager = ResourceManager(resource_dir=str(directory), backend=LocalBackend(latency=0, jitter=0),
+                              poll_interval=0)
+    manager.load_resources()
+    return manager
+
+
+def make_agent(resource_manager, **attributes):
+    agent = CybersecurityAgent(resource_manager, {}, backend=LocalBackend(latency=0, jitter=0,
+                                                                          template=LONG_ANSWER))
+    for name, value in attributes.items():
+        setattr(agent, name, value)
+    return agent
+
+
+def test_memory_folds_turns_over_token_budget():
+    memory = ConversationMemory(max_turns=4, summary_token_budget=256, turn_token_budget=1024)
+    for n in range(4):
+        memory.add(f"Question {n}?", LONG_ANSWER.format(question=n))
+    assert len(memory.turns) == 1
+    assert memory.summary.count("Q: ") == 3
+    assert memory.token_count() <= 1024 + 256
+
+
+@pytest.mark.parametrize("turn_tokens", [1024, None])
+def test_long_answers_keep_prompt_within_budget(resource_manager, turn_tokens):
+    agent = make_agent(resource_manager, memory_turn_tokens=turn_tokens)
+    session = {}
+    for question in ("What is phishing?", "What is malware?", "What is DDoS?", "What is ransomware?",
+                     "What is a man-in-the-middle attack?", "How do I stay safe?"):
+        answer, timings = agent.get_answer(question, session)
+        assert len(answer) > 2900
+        assert timings["prompt_tokens"] + timings["history_tokens"] <= agent.max_prompt_tokens
+    assert session["MEMORY"]["cybersecurity"].summary
+
+
+def test_history_left_out_when_only_question_fits(resource_manager):
+    agent = make_agent(resource_manager)
+    memory = ConversationMemory()
+    memory.add("What is phishing?", LONG_ANSWER.format(question="phishing"))
+    template = agent.prompt_template
+    agent.max_prompt_tokens = template.count_tokens(template.render_suffix("What is malware?"))
+    prompt, tokens, kept, history_tokens = agent.fit_prompt("What is malware?", "User", [], memory)
+    assert history_tokens == 0 and tokens == agent.max_prompt_tokens
+    assert memory.summary and not memory.turns
+
+
+def test_question_over_budget_raises(resource_manager):
+    agent = make_agent(resource_manager)
+    with pytest.raises(PromptTooLongError):
+        agent.get_answer("What is " + "very " * agent.max_prompt_tokens + "long?", {})
@@ -0,0 +1,30 @@
+import os
+import pytest
+from multi_agent_system.agents.cybersecurity_agent import CybersecurityAgent
+from multi_agent_system.llm_backend import LocalBackend
+from multi_agent_system.resource_manager import ResourceManager
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "uSucceed_resource")
+
+
+@pytest.fixture(scope="module")
+def agent(tmp_path_factory):
+    # Every page of the DDoS guide has TLP markings and the publisher's address.
+    backend = LocalBackend(latency=0, jitter=0)
+    manager = ResourceManager(resource_dir=RESOURCE_DIR, backend=backend, poll_interval=0,
+                              manifest_path=str(tmp_path_factory.mktemp("manifest") / "manifest.json"))
+    manager.load_resources()
+    return CybersecurityAgent(manager, {}, backend=backend)
+
+
+@pytest.mark.parametrize("question", ["What is a DDoS attack?", "What is the TLP marking of this guide?",
+                                      "How do I contact the security operations center?"])
+def test_fallback_skips_headers_and_contact_details(agent, question):
+    answer = agent.fallback_answer(question)
+    for boilerplate in ("TLP", "@", "787.4722", "Page ", "Greenbush"):
+        assert boilerplate not in answer
+
+
+def test_fallback_prefers_sentence_with_question_terms(agent):
+    answer = agent.fallback_answer("What is a DDoS attack?")
+    assert answer.startswith("Quick answer from my data banks:") and "DDoS" in answer
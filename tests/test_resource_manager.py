@@ -0,0 +1,47 @@
+import os
+import shutil
+from datetime import datetime, timedelta
+from multi_agent_system.llm_backend import LocalBackend
+from multi_agent_system.resource_manager import ResourceManager
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "uSucceed_resource")
+GUIDE_NAME = "uSucceed_VR_Assistant_Guide.pdf"
+
+
+class CountingBackend(LocalBackend):
+    def __init__(self):
+        super().__init__(latency=0, jitter=0)
+        self.uploads = []
+        self.expiration_time = None  # Of the next uploaded file
+
+    def upload_file(self, path, mime_type, display_name):
+        self.uploads.append(display_name)
+        file_obj = super().upload_file(path, mime_type, display_name)
+        file_obj.expiration_time, self.expiration_time = self.expiration_time, None
+        return file_obj
+
+
+def make_manager(tmp_path):
+    shutil.copy(os.path.join(RESOURCE_DIR, GUIDE_NAME), tmp_path / GUIDE_NAME)
+    backend = CountingBackend()
+    return ResourceManager(resource_dir=str(tmp_path), backend=backend, poll_interval=0), backend
+
+
+def test_reload_keeps_live_unchanged_upload(tmp_path):
+    manager, backend = make_manager(tmp_path)
+    manager.load_resources()
+    first = manager.files[0]
+    manager.load_resources()
+    assert backend.uploads == [GUIDE_NAME]
+    assert manager.files[0] is first
+
+
+def test_reload_reuploads_expired_unchanged_file(tmp_path):
+    manager, backend = make_manager(tmp_path)
+    backend.expiration_time = datetime.now() + timedelta(minutes=30)
+    manager.load_resources()
+    expired = manager.files[0]
+    manager.load_resources()
+    assert backend.uploads == [GUIDE_NAME, GUIDE_NAME]
+    assert manager.files[0] is not expired
+    assert manager.files[0].expiration_time is None
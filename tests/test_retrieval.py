@@ -0,0 +1,37 @@
+import os
+import re
+import shutil
+import pytest
+from multi_agent_system.llm_backend import LocalBackend
+from multi_agent_system.resource_manager import ResourceManager
+from multi_agent_system.retrieval import LexicalIndex, preprocess
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "uSucceed_resource")
+ROOMS_NAME = "CONTEXT_Rooms_And_Tasks.pdf"
+
+
+def test_preprocess_splits_room_names():
+    assert preprocess("where am i, roomname: Room3") == "where am i, roomname: room 3"
+
+
+def test_room_number_selects_passage():
+    index = LexicalIndex([("rooms.pdf", f"Room {n} Description: the player learns about topic {n}.")
+                          for n in range(1, 5)])
+    assert index.search("where am i, roomname: room3", k=1)[0].text.startswith("Room 3")
+
+
+@pytest.fixture(scope="module")
+def rooms_manager(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("resources")
+    shutil.copy(os.path.join(RESOURCE_DIR, ROOMS_NAME), directory / ROOMS_NAME)
+    manager = ResourceManager(resource_dir=str(directory), backend=LocalBackend(latency=0, jitter=0),
+                              poll_interval=0)
+    manager.load_resources()
+    return manager
+
+
+@pytest.mark.parametrize("room", [1, 2, 3, 4])
+@pytest.mark.parametrize("question", ["where am i, roomname: room{}", "What is my task here? roomname: room{}"])
+def test_room_question_retrieves_room_section(rooms_manager, question, room):
+    passage = rooms_manager.search(question.format(room), "location", k=1)[0]
+    assert str(room) in re.findall(r"(?i)\broom\s*(\d)", passage.text)
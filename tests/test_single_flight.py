@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from multi_agent_system.single_flight import SingleFlight
+
+
+async def start(single_flight, key, func):
+    task = asyncio.create_task(single_flight.do_async(key, func))
+    await asyncio.sleep(0.01)
+    return task
+
+
+def test_waiters_retry_when_leader_is_cancelled():
+    single_flight, calls = SingleFlight(), []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def scenario():
+        leader = await start(single_flight, "key", generate)
+        waiters = [await start(single_flight, "key", generate) for _ in range(2)]
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    assert sorted(asyncio.run(scenario())) == [(2, False), (2, True)]
+
+
+def test_cancelled_waiter_leaves_leader_running():
+    single_flight = SingleFlight()
+
+    async def generate():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def scenario():
+        leader = await start(single_flight, "key", generate)
+        waiter = await start(single_flight, "key", generate)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(scenario()) == ("answer", False)